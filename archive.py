@@ -0,0 +1,83 @@
+"""
+
+    archive.py
+    ~~~~~~~~~~
+    Record raw bookie payloads into a compressed archive and replay them with no network.
+
+    @author: z33k
+
+    NOTE: an archive is a gzipped JSON Lines file, one recorded response per line.
+
+"""
+import gzip
+import json
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+from threading import Lock
+from typing import Any, Deque, Dict, Generator, Optional, Tuple, Union
+
+
+def _postkey(postdata: Optional[Dict[str, Any]]) -> str:
+    return json.dumps(postdata, sort_keys=True) if postdata else ""
+
+
+class Recorder:
+    """Append raw responses (with their URLs, POST data and timestamps) to a gzipped archive.
+    """
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.count = 0
+        self._lock = Lock()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(path='{self.path}', count={self.count})"
+
+    def record(self, url: str, text: str, postdata: Optional[Dict[str, Any]] = None) -> None:
+        line = json.dumps({"url": url, "postdata": postdata, "timestamp": time.time(),
+                           "text": text}, ensure_ascii=False)
+        with self._lock:
+            # each append makes a new gzip member, gzip reads them all back as one stream
+            with gzip.open(self.path, "at", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self.count += 1
+
+
+def read_archive(path: Union[str, Path]) -> Generator[Dict[str, Any], None, None]:
+    """Yield recorded responses from archive at 'path' in order of recording.
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class Replayer:
+    """Serve responses recorded in archive at 'path' instead of requesting them.
+
+    Responses are served in order they were recorded in (if a URL was requested many times, its
+    last response is served from then on). If there's no response recorded for the exact POST
+    data (e.g. because it contains timestamps), one recorded for the same URL is served.
+    """
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        self._responses: Dict[Tuple[str, str], Deque[str]] = defaultdict(deque)
+        self._url_responses: Dict[str, Deque[str]] = defaultdict(deque)
+        for item in read_archive(self.path):
+            self._responses[(item["url"], _postkey(item["postdata"]))].append(item["text"])
+            self._url_responses[item["url"]].append(item["text"])
+        self._lock = Lock()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(path='{self.path}', " \
+               f"responses={sum(len(q) for q in self._responses.values())})"
+
+    def serve(self, url: str, postdata: Optional[Dict[str, Any]] = None) -> str:
+        with self._lock:
+            responses = self._responses.get((url, _postkey(postdata)))
+            if not responses:
+                responses = self._url_responses.get(url)
+            if not responses:
+                raise LookupError(f"No response recorded for: '{url}' in '{self.path}'.")
+            return responses.popleft() if len(responses) > 1 else responses[0]
@@ -0,0 +1,113 @@
+"""
+
+    bench.py
+    ~~~~~~~~
+    Benchmark the scraping internals on synthetic data.
+
+    @author: z33k
+
+"""
+from typing import Callable, List
+
+from contexttimer import Timer
+
+from cache import ParseMemo
+from scrape import OddsPair
+from scrape.forbet import ForbetOdds, pair
+from utils import close_parse_pool, pipeline, set_parse_memo
+
+SIZES = (1_000, 2_000, 4_000, 8_000, 16_000)
+PAGE_SIZES = (250, 1_000, 4_000)  # rows of a markup page
+
+
+def _forbet_odds(size: int) -> List[ForbetOdds]:
+    odds_list = []
+    for i in range(size // 2):
+        home, away = f"Player{i}A", f"Player{i}B"
+        event = f"{home} - {away}"
+        odds_list += [ForbetOdds(home, 1.5, event), ForbetOdds(away, 2.5, event)]
+    return odds_list
+
+
+def _quadratic_pair(odds_list: List[ForbetOdds]) -> List[OddsPair]:
+    # the former forbet.getpairs() pairing logic, kept for comparison
+    pairs, odds_list = [], odds_list[:]
+    for o in odds_list[:]:
+        complement = next((odds for odds in odds_list if o.contender in odds.event
+                           and o.contender != odds.contender), None)
+        if not complement:
+            continue
+        else:
+            pairs.append(OddsPair(o, complement, o.event))
+            odds_list.remove(o)
+    return pairs
+
+
+def bench_forbet_pairing(func: Callable[[List[ForbetOdds]], List[OddsPair]] = pair) -> None:
+    """Time 'func' pairing ever bigger Forbet offers.
+
+    Linear scaling shows as a roughly constant time per outcome across sizes.
+    """
+    print(f"Benchmarking {func.__name__}()...")
+    for size in SIZES:
+        odds_list = _forbet_odds(size)
+        with Timer() as t:
+            pairs = func(odds_list)
+        assert len(pairs) == size // 2
+        print(f"{size:>7} outcome(s): {t.elapsed:.4f} seconds "
+              f"({t.elapsed / size * 1_000_000:.2f} µs per outcome).")
+
+
+def _fortuna_markup(size: int, tables: int = 10) -> str:
+    sections = []
+    for t in range(tables):
+        rows = "".join(f"<tr><td>Player{i}A P. - Player{i}B P.</td><td>1,50</td><td>2,50</td></tr>"
+                       for i in range(t, size, tables))
+        sections.append(f"<section class='competition-box'><span class='competition-name'>"
+                        f"K-WTA Tournament{t}, singiel</span><table><tr><th>Mecz</th><th>1</th>"
+                        f"<th>2</th></tr>{rows}</table></section>")
+    return f"<html><body>{''.join(sections)}</body></html>"
+
+
+def _parse_pipelined(markup: str) -> List[OddsPair]:
+    from scrape.fortuna import _parse_page
+
+    (pairs,) = pipeline(lambda page: page, _parse_page, [markup], "bench")
+    return pairs
+
+
+def bench_parse_memo() -> None:
+    """Time parsing ever bigger Fortuna pages in the parsing pipeline against serving them from
+    a warm parse memo, both as a whole and with one of their tables changed (so only that one
+    gets parsed anew).
+
+    Memoising pays as long as a memo hit takes a fraction of what parsing does.
+    """
+    print("Benchmarking parse memo...")
+    _parse_pipelined(_fortuna_markup(10))  # spin the parsing pool up
+    try:
+        for size in PAGE_SIZES:
+            markup = _fortuna_markup(size)
+            set_parse_memo(None)
+            with Timer() as parsing:
+                pairs = _parse_pipelined(markup)
+            set_parse_memo(ParseMemo())
+            _parse_pipelined(markup)
+            with Timer() as hit:
+                cached = _parse_pipelined(markup)
+            with Timer() as changed:
+                partly_cached = _parse_pipelined(markup.replace("1,50", "1,55", 1))
+            assert len(pairs) == len(cached) == len(partly_cached) == size
+            print(f"{size:>7} row(s): parsing {parsing.elapsed:.4f} seconds, memo hit "
+                  f"{hit.elapsed:.4f} seconds ({parsing.elapsed / hit.elapsed:.0f}x faster), "
+                  f"one table changed {changed.elapsed:.4f} seconds "
+                  f"({parsing.elapsed / changed.elapsed:.1f}x faster).")
+    finally:
+        set_parse_memo(None)
+        close_parse_pool()
+
+
+if __name__ == "__main__":
+    bench_forbet_pairing()
+    bench_forbet_pairing(_quadratic_pair)
+    bench_parse_memo()
@@ -0,0 +1,258 @@
+"""
+
+    cache.py
+    ~~~~~~~~
+    On-disk HTTP response cache, category discovery cache and in-memory parse memo.
+
+    @author: z33k
+
+    NOTE: entries are keyed by URL and POST data. Fresh entries (younger than TTL) are served
+    without touching the network, stale ones get revalidated with their ETag/Last-Modified
+    validators (so the server can answer with a cheap '304 Not Modified').
+
+    Discovered categories (e.g. bookies' ATP/WTA tournament ids) change at most a few times a day,
+    so they're cached separately with a much longer TTL.
+
+    Most of the offer doesn't change between two polls, so results of parsing markup pages (and
+    their parts, e.g. tables) can be memoised by fingerprints of their raw markup (a hit costs
+    a fraction of what parsing does). Decoded JSON isn't memoised, as parsing it amounts to
+    reading a few fields anyway.
+
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Hashable, List, Mapping, Optional, Union
+
+log = logging.getLogger(__name__)
+
+DEFAULT_DIR = Path.home() / ".cache" / "tenbook" / "http"
+DEFAULT_TTL = 60.0  # seconds
+DEFAULT_MAX_SIZE = 200 * 1024 * 1024  # bytes
+DEFAULT_CATEGORY_DIR = Path.home() / ".cache" / "tenbook" / "categories"
+DEFAULT_CATEGORY_TTL = 6 * 60 * 60.0  # seconds
+DEFAULT_MEMO_SIZE = 4096  # entries
+
+
+@dataclass
+class CacheEntry:
+    """Cached response.
+    """
+    url: str
+    text: str
+    stored: float  # timestamp
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.stored
+
+    @property
+    def validators(self) -> Dict[str, str]:
+        """Return headers for a conditional request revalidating this entry.
+        """
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """Size-bounded on-disk cache of HTTP responses with TTL expiry.
+
+    When the cache grows past 'max_size' bytes, the least recently used entries are evicted.
+    """
+    def __init__(self, directory: Path = DEFAULT_DIR, ttl: float = DEFAULT_TTL,
+                 max_size: int = DEFAULT_MAX_SIZE) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = Lock()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(directory='{self.directory}', ttl={self.ttl}, " \
+               f"max_size={self.max_size})"
+
+    @staticmethod
+    def key(url: str, postdata: Optional[Dict[str, Any]] = None) -> str:
+        body = json.dumps(postdata, sort_keys=True) if postdata else ""
+        return hashlib.sha256(f"{url}\n{body}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        return entry.age < self.ttl
+
+    def get(self, url: str, postdata: Optional[Dict[str, Any]] = None) -> Optional[CacheEntry]:
+        """Return entry cached for 'url' and 'postdata' (fresh or not) or None if there's none.
+        """
+        path = self._path(self.key(url, postdata))
+        try:
+            with path.open(encoding="utf-8") as f:
+                entry = CacheEntry(**json.load(f))
+            os.utime(path)  # mark as recently used
+        except (OSError, ValueError, TypeError):
+            return None
+        return entry
+
+    def put(self, url: str, text: str, postdata: Optional[Dict[str, Any]] = None,
+            headers: Optional[Mapping[str, str]] = None) -> CacheEntry:
+        """Store response 'text' (with validators from its 'headers') for 'url' and 'postdata'.
+        """
+        headers = headers or {}
+        entry = CacheEntry(url, text, time.time(), headers.get("ETag"),
+                           headers.get("Last-Modified"))
+        self._write(self.key(url, postdata), entry)
+        self._evict()
+        return entry
+
+    def refresh(self, entry: CacheEntry, postdata: Optional[Dict[str, Any]] = None,
+                headers: Optional[Mapping[str, str]] = None) -> CacheEntry:
+        """Mark 'entry' as fresh again (e.g. after a '304 Not Modified' response).
+        """
+        headers = headers or {}
+        entry.stored = time.time()
+        entry.etag = headers.get("ETag", entry.etag)
+        entry.last_modified = headers.get("Last-Modified", entry.last_modified)
+        self._write(self.key(entry.url, postdata), entry)
+        return entry
+
+    def _write(self, key: str, entry: CacheEntry) -> None:
+        path = self._path(key)
+        tmp = path.with_suffix(f".{os.getpid()}.{id(entry)}.tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(asdict(entry), f, ensure_ascii=False)
+        os.replace(tmp, path)  # atomic, so concurrent readers never see a partial entry
+
+    def _evict(self) -> None:
+        with self._lock:
+            files = []
+            for item in os.scandir(self.directory):
+                if item.name.endswith(".json"):
+                    try:
+                        stat = item.stat()
+                    except OSError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, item.path))
+            total = sum(size for _, size, _ in files)
+            for _, size, path in sorted(files):
+                if total <= self.max_size:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            for path in self.directory.glob("*.json"):
+                path.unlink()
+
+
+class CategoryCache:
+    """On-disk cache of discovered categories with TTL expiry.
+
+    Entries are keyed by an arbitrary string (e.g. URL of the discovery request) and hold a
+    JSON-serializable list.
+    """
+    def __init__(self, directory: Path = DEFAULT_CATEGORY_DIR,
+                 ttl: float = DEFAULT_CATEGORY_TTL) -> None:
+        self.directory = Path(directory)
+        self.ttl = ttl
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(directory='{self.directory}', ttl={self.ttl})"
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{hashlib.sha256(key.encode('utf-8')).hexdigest()}.json"
+
+    def get(self, key: str) -> Optional[List[Any]]:
+        """Return categories cached for 'key' or None if there are none (or they've expired).
+        """
+        try:
+            with self._path(key).open(encoding="utf-8") as f:
+                entry = json.load(f)
+            if time.time() - entry["stored"] >= self.ttl:
+                return None
+            return entry["values"]
+        except (OSError, ValueError, TypeError, KeyError):
+            return None
+
+    def put(self, key: str, values: List[Any]) -> None:
+        """Cache 'values' for 'key' (failing to, e.g. in a read-only home, only gets logged).
+        """
+        path = self._path(key)
+        tmp = path.with_suffix(f".{os.getpid()}.{id(values)}.tmp")
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with tmp.open("w", encoding="utf-8") as f:
+                json.dump({"key": key, "values": values, "stored": time.time()}, f)
+            os.replace(tmp, path)  # atomic, so concurrent readers never see a partial entry
+        except OSError as e:
+            log.warning(f"Failed to cache categories for '{key}': {e!r}.")
+
+    def invalidate(self, key: str) -> None:
+        try:
+            self._path(key).unlink()
+        except OSError:
+            pass
+
+    def clear(self) -> None:
+        for path in self.directory.glob("*.json"):
+            path.unlink()
+
+
+class ParseMemo:
+    """Thread-safe in-memory LRU cache of parse results keyed by fingerprints of their payloads.
+
+    Results are shared between lookups, so they should be treated as immutable.
+    """
+    def __init__(self, max_size: int = DEFAULT_MEMO_SIZE) -> None:
+        self.max_size = max_size
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = Lock()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(entries={len(self._entries)}, " \
+               f"max_size={self.max_size})"
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def fingerprint(payload: Union[str, bytes]) -> bytes:
+        """Return a fast hash of raw (not yet decoded) 'payload', e.g. markup.
+        """
+        data = payload.encode("utf-8") if isinstance(payload, str) else payload
+        return hashlib.blake2b(data, digest_size=16).digest()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            try:
+                self._entries.move_to_end(key)
+            except KeyError:
+                return default
+            return self._entries[key]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
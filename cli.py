@@ -0,0 +1,56 @@
+"""
+
+    cli.py
+    ~~~~~~
+    Command-line plumbing shared by the scripts.
+
+    @author: z33k
+
+"""
+import argparse
+import logging
+import sys
+from typing import List, Optional, Tuple
+
+from scrape.registry import PROVIDERS
+
+
+def provider_seconds(text: str) -> Tuple[str, float]:
+    """Parse a NAME=SECONDS argument (e.g. "lv_bet=30") into a provider's name and seconds.
+    """
+    name, _, seconds = text.partition("=")
+    if name not in PROVIDERS:
+        raise argparse.ArgumentTypeError(f"unknown provider: '{name}'")
+    try:
+        return name, float(seconds)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid value: '{text}' (expected: NAME=SECONDS)")
+
+
+def add_common_arguments(parser: argparse.ArgumentParser, action: str) -> None:
+    """Add the providers to 'action' (e.g. "scrape") and verbosity arguments to 'parser'.
+    """
+    parser.add_argument("providers", nargs="*", metavar="provider",
+                        help=f"providers to {action} (all if not specified): "
+                             f"{', '.join(PROVIDERS)}")
+    parser.add_argument("-v", "--verbose", action="count", default=0,
+                        help="log progress (-vv for debug)")
+
+
+def parse_args(parser: argparse.ArgumentParser,
+               argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse 'argv' with 'parser' (set up with add_common_arguments()) and check the providers.
+    """
+    args = parser.parse_args(argv)
+    unknown = [p for p in args.providers if p not in PROVIDERS]
+    if unknown:
+        parser.error(f"unknown provider(s): {', '.join(unknown)} "
+                     f"(choose from: {', '.join(PROVIDERS)})")
+    return args
+
+
+def configure_logging(verbose: int, fmt: str = "%(message)s") -> None:
+    """Log to stderr at level set by count of '-v' flags.
+    """
+    level = {0: logging.WARNING, 1: logging.INFO}.get(verbose, logging.DEBUG)
+    logging.basicConfig(level=level, format=fmt, stream=sys.stderr)
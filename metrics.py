@@ -0,0 +1,138 @@
+"""
+
+    metrics.py
+    ~~~~~~~~~~
+    Per-provider, per-stage scraping metrics.
+
+    @author: z33k
+
+    NOTE: stages are: 'fetch' (network), 'decode' (JSON decoding), 'parse' (building odds pairs
+    from decoded data or markup) and 'pair' (pairing loose odds). 'cached' counts parse results
+    reused from the parse memo. Metrics can be exported in Prometheus text format or as JSON.
+
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock
+from time import perf_counter
+from typing import Any, Dict, Generator, List, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)  # seconds
+COUNTERS = ("requests", "bytes", "errors", "pairs", "cached")
+PREFIX = "tenbook"
+
+
+class Histogram:
+    """Cumulative latency histogram (Prometheus-style).
+    """
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is for '+Inf'
+        self.sum = 0.0
+        self.count = 0
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(count={self.count}, sum={self.sum:.3f})"
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    @property
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """Return (upper bound, cumulative count) tuples for all buckets.
+        """
+        bounds = [*(f"{b}" for b in self.buckets), "+Inf"]
+        result, total = [], 0
+        for bound, count in zip(bounds, self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class Metrics:
+    """Thread-safe registry of latency histograms and counters labeled by provider and stage.
+    """
+    def __init__(self) -> None:
+        self.latencies: Dict[Tuple[str, str], Histogram] = {}
+        self.counters: Dict[Tuple[str, str, str], float] = {}
+        self._lock = Lock()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(series={len(self.latencies) + len(self.counters)})"
+
+    def observe(self, provider: str, stage: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self.latencies.get((provider, stage))
+            if histogram is None:
+                histogram = self.latencies[(provider, stage)] = Histogram()
+            histogram.observe(seconds)
+
+    def count(self, name: str, provider: str, stage: str, value: float = 1) -> None:
+        if name not in COUNTERS:
+            raise ValueError(f"Unknown counter: '{name}'. Known: {COUNTERS}.")
+        with self._lock:
+            key = (name, provider, stage)
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    @contextmanager
+    def timed(self, provider: str, stage: str) -> Generator[None, None, None]:
+        """Observe latency of the enclosed block (and count an error if it raises).
+        """
+        start = perf_counter()
+        try:
+            yield
+        except Exception:
+            self.count("errors", provider, stage)
+            raise
+        finally:
+            self.observe(provider, stage, perf_counter() - start)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.latencies.clear()
+            self.counters.clear()
+
+    def to_json(self) -> Dict[str, Any]:
+        """Return metrics as a JSON-serializable dict nested by provider and stage.
+        """
+        result: Dict[str, Any] = {}
+        with self._lock:
+            for (provider, stage), histogram in self.latencies.items():
+                entry = result.setdefault(provider, {}).setdefault(stage, {})
+                entry["latency"] = {"count": histogram.count, "sum": histogram.sum,
+                                    "buckets": dict(histogram.cumulative)}
+            for (name, provider, stage), value in self.counters.items():
+                result.setdefault(provider, {}).setdefault(stage, {})[name] = value
+        return result
+
+    def to_prometheus(self) -> str:
+        """Return metrics in Prometheus text exposition format.
+        """
+        def labels(provider: str, stage: str, **extra: str) -> str:
+            pairs = {"provider": provider, "stage": stage, **extra}
+            escaped = {k: v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+                       for k, v in pairs.items()}
+            return "{" + ",".join(f'{k}="{v}"' for k, v in escaped.items()) + "}"
+
+        lines = []
+        with self._lock:
+            name = f"{PREFIX}_latency_seconds"
+            lines += [f"# HELP {name} Latency of a scraping stage.", f"# TYPE {name} histogram"]
+            for (provider, stage), histogram in sorted(self.latencies.items()):
+                for bound, count in histogram.cumulative:
+                    lines.append(f"{name}_bucket{labels(provider, stage, le=bound)} {count}")
+                lines.append(f"{name}_sum{labels(provider, stage)} {histogram.sum}")
+                lines.append(f"{name}_count{labels(provider, stage)} {histogram.count}")
+            for counter in COUNTERS:
+                name = f"{PREFIX}_{counter}_total"
+                lines += [f"# HELP {name} Total {counter} of a scraping stage.",
+                          f"# TYPE {name} counter"]
+                for (cname, provider, stage), value in sorted(self.counters.items()):
+                    if cname == counter:
+                        lines.append(f"{name}{labels(provider, stage)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
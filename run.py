@@ -6,41 +6,93 @@
 
     @author: z33k
 
+    NOTE: usage e.g.: 'python run.py betclic lv_bet -f json --metrics prometheus'. Only the
+    selected providers' modules (and their dependencies) get imported.
+
 """
-from pprint import pprint
-#
-# from scrape import betclic, betfan
-#
-# betclic_odds = betclic.getodds()
-# betfan_odds = betfan.getodds()
-# print()
-# print("Betclic odds:")
-# print("=============")
-# pprint(betclic_odds)
-# print("BETFAN odds:")
-# print("============")
-# pprint(betfan_odds)
-
-# from scrape.forbet import getpairs
-# pairs = getpairs()
-# print(len(pairs))
-
-from pprint import pprint
-from scrape import betclic, betx, betfan, etoto, ewinner, forbet, fortuna, fuksiarz, lv_bet
-
-pairs = [
-    # *betclic.getpairs(),
-    # *betx.getpairs(),
-    # *betfan.getpairs(),
-    # *etoto.getpairs(),
-    # *ewinner.getpairs(),
-    # *forbet.getpairs(),
-    *fortuna.getpairs(),
-    # *fuksiarz.getpairs(),
-    # *lv_bet.getpairs(),
-]
-# pprint(sorted([p for p in pairs if "Jabeur" in p.nameparts], key=lambda p: p.spread))
-pprint(sorted(pairs, key=lambda p: p.spread))
+import argparse
+import csv
+import json
+import sys
+from typing import List, Optional
+
+from archive import Recorder, Replayer
+from cache import ResponseCache
+from cli import add_common_arguments, configure_logging, parse_args, provider_seconds
+from metrics import METRICS
+from scrape import OddsPair
+from scrape.registry import PROVIDERS
+from scrape.sweep import sweep
+from utils import set_cache, set_recorder, set_replayer
+
+FORMATS = ("text", "json", "csv")
+SORT_KEYS = ("spread", "margin", "provider")
+FIELDS = ("provider", "event", "home", "away", "home_odds", "away_odds", "margin", "spread")
+
+
+def _write(pairs: List[OddsPair], fmt: str) -> None:
+    if fmt == "json":
+        json.dump([p.to_json() for p in pairs], sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write("\n")
+    elif fmt == "csv":
+        writer = csv.DictWriter(sys.stdout, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(p.to_json() for p in pairs)
+    else:
+        for pair in pairs:
+            print(pair)
+
+
+def _parse_args(argv: Optional[List[str]]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Scrape polish tennis bookies for odds.")
+    add_common_arguments(parser, "scrape")
+    parser.add_argument("-l", "--list", action="store_true", help="list providers and exit")
+    parser.add_argument("-f", "--format", choices=FORMATS, default="text",
+                        help="output format of odds pairs (default: %(default)s)")
+    parser.add_argument("-s", "--sort", choices=SORT_KEYS, default="spread",
+                        help="sort odds pairs by (default: %(default)s)")
+    parser.add_argument("-t", "--timeout", type=float,
+                        help="seconds the whole sweep may take (partial results are output then)")
+    parser.add_argument("-T", "--provider-timeout", type=provider_seconds, action="append",
+                        default=[], metavar="NAME=SECONDS",
+                        help="seconds scraping of a particular provider may take")
+    parser.add_argument("-m", "--metrics", choices=("json", "prometheus"),
+                        help="print scraping metrics to stderr in this format")
+    parser.add_argument("--cache", action="store_true", help="cache HTTP responses on disk")
+    hooks = parser.add_mutually_exclusive_group()
+    hooks.add_argument("--record", metavar="PATH", help="record HTTP responses to an archive")
+    hooks.add_argument("--replay", metavar="PATH",
+                       help="serve HTTP responses from an archive instead of the network")
+    return parse_args(parser, argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = _parse_args(argv)
+    if args.list:
+        print("\n".join(PROVIDERS))
+        return 0
+
+    configure_logging(args.verbose)
+    if args.cache:
+        set_cache(ResponseCache())
+    if args.record:
+        set_recorder(Recorder(args.record))
+    if args.replay:
+        set_replayer(Replayer(args.replay))
 
+    result = sweep(*args.providers, timeout=args.timeout, timeouts=dict(args.provider_timeout))
+    if args.sort == "provider":
+        pairs = sorted(result.pairs, key=lambda p: (p.home.PROVIDER, p.event))
+    else:
+        pairs = sorted(result.pairs, key=lambda p: getattr(p, args.sort))
+    _write(pairs, args.format)
+    if args.metrics == "json":
+        json.dump(METRICS.to_json(), sys.stderr, indent=2)
+        sys.stderr.write("\n")
+    elif args.metrics == "prometheus":
+        sys.stderr.write(METRICS.to_prometheus())
+    return 0
 
 
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,14 +8,20 @@
 
 """
 import json
+import logging
 from abc import ABCMeta
-from dataclasses import dataclass
-from time import sleep
-from typing import Generator, List, Optional, Tuple, Type, Union
+from typing import Any, Dict, Generator, List, Optional, Tuple, Type, Union
 
-from utils import Json, timed_request
+import requests
 
-THROTTLING_PERIOD = 0.5  # seconds
+from metrics import METRICS
+from utils import Json, configure_limiter, discover, invalidate_discovery, \
+    timed_request
+
+log = logging.getLogger(__name__)
+
+RATE = 2.0  # requests per second (initial, adapted to how the site copes)
+CHUNK_SIZE = 20  # category ids per one multi-category events request
 
 
 def percent(fraction: float, precision: int = 2) -> str:
@@ -26,7 +32,11 @@ def percent(fraction: float, precision: int = 2) -> str:
 
 class Odds(metaclass=ABCMeta):
     """Basic interface for Odds objects.
+
+    Odds are slotted (subclasses have to declare their own '__slots__' to stay that way) and their
+    hash is computed once at instantiation, so they should be treated as immutable.
     """
+    __slots__ = ("contender", "odds", "_hash")
     PROVIDER: Optional[str] = None
 
     def __init__(self, contender: str, odds: float) -> None:
@@ -34,6 +44,20 @@ class Odds(metaclass=ABCMeta):
             raise TypeError(f"Abstract class {self.__class__.__name__} must not be instantiated.")
         self.contender = self._normalize(contender)
         self.odds = odds
+        self._hash = self._gethash()
+
+    def _gethash(self) -> int:
+        return hash((self.PROVIDER, self.contender, self.odds))
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # string hashes differ between processes, so the cached hash mustn't be pickled
+        return {slot: getattr(self, slot) for cls in type(self).__mro__
+                for slot in getattr(cls, "__slots__", ()) if slot != "_hash"}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        for slot, value in state.items():
+            setattr(self, slot, value)
+        self._hash = self._gethash()
 
     @staticmethod
     def _normalize(contender) -> str:
@@ -55,26 +79,45 @@ class Odds(metaclass=ABCMeta):
         https://stackoverflow.com/questions/390250/elegant-ways-to-support-equivalence-equality-in-python-classes)
         """
         if isinstance(self, other.__class__):
-            return self.contender == other.contender and self.odds == self.odds
+            return self.contender == other.contender and self.odds == other.odds
         return NotImplemented
 
     def __hash__(self) -> int:
         """Make this object hashable
         """
-        return hash(tuple(sorted(self.__dict__.items())))
+        return self._hash
 
     @property
     def as_percent(self) -> float:
         return 1 / self.odds
 
 
-@dataclass
 class OddsPair:
     """Pair of odds for one match.
+
+    Like Odds, it's slotted and caches its hash, so it should be treated as immutable.
     """
-    home: Odds
-    away: Odds
-    event: str = ""
+    __slots__ = ("home", "away", "event", "_hash")
+
+    def __init__(self, home: Odds, away: Odds, event: str = "") -> None:
+        self.home = home
+        self.away = away
+        self.event = event
+        self._hash = hash((home, away, event))
+
+    def __getstate__(self) -> Tuple[Odds, Odds, str]:
+        return self.home, self.away, self.event
+
+    def __setstate__(self, state: Tuple[Odds, Odds, str]) -> None:
+        self.__init__(*state)
+
+    def __eq__(self, other: "OddsPair") -> Union[bool, "NotImplemented"]:
+        if isinstance(other, OddsPair):
+            return (self.home, self.away, self.event) == (other.home, other.away, other.event)
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return self._hash
 
     def __repr__(self) -> str:
         repr_ = f"{self.__class__.__name__}([{self.home}, {self.away}], "
@@ -87,6 +130,14 @@ class OddsPair:
     def as_tuple(self) -> Tuple[Odds, Odds]:
         return self.home, self.away
 
+    def to_json(self) -> Json:
+        """Return this pair as a JSON-serializable dict.
+        """
+        return {"provider": self.home.PROVIDER, "event": self.event, "home": self.home.contender,
+                "away": self.away.contender, "home_odds": self.home.odds,
+                "away_odds": self.away.odds, "margin": round(self.margin, 4),
+                "spread": round(self.spread, 2)}
+
     @property
     def margin(self) -> float:
         return self.home.as_percent + self.away.as_percent - 1
@@ -131,7 +182,7 @@ def pairs_to_odds(odds_pairs: List[OddsPair]) -> List[Odds]:
     """Return a flat list of all odds from odds_pairs.
     """
     odds = [o for pair in odds_pairs for o in pair.as_tuple]
-    print(f"Converted {len(odds_pairs)} odds pair(s) to odds.")
+    log.debug(f"Converted {len(odds_pairs)} odds pair(s) to odds.")
     return odds
 
 
@@ -141,16 +192,29 @@ class CategorizedEventsParser:
     Sites with categorized events need first to retrieve categories, and then based on this,
     a proper event URL can be parsed.
 
+    Events are requested from a multi-category endpoint, so many category ids get packed into one
+    request ('chunk_size' of them at most). Should a chunked request fail, its categories are
+    re-requested one by one. All requests to the site are spaced out by its host's adaptive rate
+    limiter (set up with 'rate').
+
+    Discovered categories are cached (see utils.discover()) until they expire or requesting their
+    events fails.
+
     The sites using this infrastructure:
     * betfan.pl
     * etoto.pl
+    * ewinner.pl
+    * fuksiarz.pl
     """
     def __init__(self, caturl: str, event_url_template: str, odds_type: Type[Odds],
-                 throttling_period: float = THROTTLING_PERIOD) -> None:
+                 rate: float = RATE, chunk_size: int = CHUNK_SIZE) -> None:
+        if chunk_size < 1:
+            raise ValueError(f"Chunk size must be a positive integer, got: {chunk_size}.")
         self.caturl = caturl
         self.event_url_template = event_url_template
         self.odds_type = odds_type
-        self.throttling_period = throttling_period
+        self.limiter = configure_limiter(caturl, rate)
+        self.chunk_size = chunk_size
 
     def _get_cats(self) -> List[int]:
         data = timed_request(self.caturl, provider=self.odds_type.PROVIDER, return_json=True)
@@ -164,24 +228,41 @@ class CategorizedEventsParser:
         atp_data = [item for item in tennisdata
                     if "ATP" in item["categoryName"] and len(item["categoryName"]) > 3
                     and not any(n in item["categoryName"] for n in to_exlude)]
-        print(f"Retrieved {len(wta_data)} WTA and {len(atp_data)} ATP tournaments for further "
-              f"parsing.")
+        log.debug(f"Retrieved {len(wta_data)} WTA and {len(atp_data)} ATP tournaments for further "
+                  f"parsing.")
         return [item["categoryId"] for item in [*wta_data, *atp_data]]
 
-    def _get_events(self, *cat_ids: int) -> List[Json]:
-        print(f"Retrieving events for {len(cat_ids)} tournaments(s).")
+    def _request_events(self, *cat_ids: int) -> List[Json]:
+        url = self.event_url_template.format(",".join(str(id_) for id_ in cat_ids))
+        return timed_request(url, provider=self.odds_type.PROVIDER, return_json=True)["data"]
+
+    def _get_chunk_events(self, *cat_ids: int) -> List[Json]:
+        errors = (requests.RequestException, ValueError, KeyError, TypeError)
+        try:
+            return self._request_events(*cat_ids)
+        except errors as e:
+            invalidate_discovery(self.caturl)  # a tournament may be gone
+            if len(cat_ids) == 1:
+                raise
+            log.warning(f"Chunked request for {len(cat_ids)} tournament(s) failed with: {e!r}. "
+                        f"Falling back to per-tournament requests...")
         events = []
         for id_ in cat_ids:
-            data = timed_request(self.event_url_template.format(id_),
-                                 provider=self.odds_type.PROVIDER,
-                                 return_json=True)["data"]
-            events.extend(data)
-            print(f"Throttling for {int(self.throttling_period * 1000)} ms..")
-            sleep(self.throttling_period)
-            print("Resumed.")
-        print(f"Retrieved {len(events)} event(s) for further parsing.")
+            try:
+                events.extend(self._request_events(id_))
+            except errors as e:
+                log.warning(f"Request for tournament #{id_} failed with: {e!r}. Skipping it...")
         return events
 
+    def _iter_events(self, *cat_ids: int) -> Generator[List[Json], None, None]:
+        # yield events chunk by chunk
+        chunks = [cat_ids[i:i + self.chunk_size]
+                  for i in range(0, len(cat_ids), self.chunk_size)]
+        log.debug(f"Retrieving events for {len(cat_ids)} tournaments(s) in {len(chunks)} "
+                  f"request(s).")
+        for chunk in chunks:
+            yield self._get_chunk_events(*chunk)
+
     def _parse_event(self, event: Json) -> Optional[OddsPair]:
         """Parse an 'eventId' object in betfan.pl's input for odds rendered as an OddsPair object.
         """
@@ -200,12 +281,24 @@ class CategorizedEventsParser:
         home, away = odds
         return OddsPair(home, away, eventname)
 
+    def _parse_events(self, events: List[Json]) -> List[OddsPair]:
+        pairs = [self._parse_event(e) for e in events]
+        return [p for p in pairs if p]  # prune None
+
+    def iter_pairs(self) -> Generator[OddsPair, None, None]:
+        """Yield all WTA and ATP odds pairs chunk of tournaments by chunk, as soon as each chunk
+        is parsed.
+        """
+        count = 0
+        for events in self._iter_events(*discover(self.caturl, self._get_cats)):
+            with METRICS.timed(self.odds_type.PROVIDER, "parse"):
+                pairs = self._parse_events(events)
+            METRICS.count("pairs", self.odds_type.PROVIDER, "parse", len(pairs))
+            count += len(pairs)
+            yield from pairs
+        log.info(f"Got {count} {self.odds_type.PROVIDER} odds pairs.")
+
     def getpairs(self) -> List[OddsPair]:
-        """Return a list of all betfan.pl's WTA and ATP odds pairs.
+        """Return a list of all WTA and ATP odds pairs.
         """
-        cats = self._get_cats()
-        events = self._get_events(*cats)
-        pairs = [self._parse_event(e) for e in events]
-        pairs = [p for p in pairs if p]  # prune None
-        print(f"Got {len(pairs)} {self.odds_type.PROVIDER} odds pairs.")
-        return pairs
+        return list(self.iter_pairs())
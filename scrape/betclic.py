@@ -10,33 +10,59 @@
     this data.
 
 """
-from typing import List, Optional
+import logging
+from typing import Generator, List, Optional, Tuple
 
 from scrape import Odds, OddsPair
-from utils import Json, timed_request
+from metrics import METRICS
+from utils import Json, configure_limiter, iter_pages, stream_json
 
-URL = "https://offer.cdn.begmedia.com/api/pub/v4/events?application=2048&countrycode=pl" \
-  "&fetchMultipleDefaultMarkets=true&language=pa&limit=400&offset=0&sitecode=plpa&sortBy" \
-  "=ByLiveRankingPreliveDate&sportIds=2"
+log = logging.getLogger(__name__)
+
+URL_TEMPLATE = "https://offer.cdn.begmedia.com/api/pub/v4/events?application=2048" \
+  "&countrycode=pl&fetchMultipleDefaultMarkets=true&language=pa&limit={}&offset={}" \
+  "&sitecode=plpa&sortBy=ByLiveRankingPreliveDate&sportIds=2"
+PAGE_SIZE = 400
+RATE = 5.0  # page requests per second (initial, adapted to how the site copes)
+configure_limiter(URL_TEMPLATE, RATE)
 
 
 class BetclicOdds(Odds):
     """betclic.pl's odds.
     """
+    __slots__ = ()
     PROVIDER = "Betclic"
 
     def __init__(self, contender: str, odds: float) -> None:
         super().__init__(contender, odds)
 
 
-def _get_events() -> List[Json]:
-    data = timed_request(URL, provider=BetclicOdds.PROVIDER, return_json=True)
+def _filter_event(event: Json) -> bool:
     # filter out 'live' events
-    data = [e for e in data if not e['isLive']]
+    if event["isLive"]:
+        return False
+    name = event["competition"]["name"]
     to_exclude = ("Challenger", "ITF", "Exhibition")
-    data = [e for e in data if not any(n in e["competition"]["name"] for n in to_exclude)]
-    data = [e for e in data if any(n in e["competition"]["name"] for n in ("WTA", "ATP"))]
-    return [e for e in data if e["markets"]]
+    if any(n in name for n in to_exclude):
+        return False
+    if not any(n in name for n in ("WTA", "ATP")):
+        return False
+    return bool(event["markets"])
+
+
+def _get_page(offset: int, limit: int) -> Tuple[List[Json], int]:
+    # return events filtered as they're streamed along with the count of all of them (as only
+    # a page shorter than the limit marks the last one)
+    count = 0
+
+    def predicate(event: Json) -> bool:
+        nonlocal count
+        count += 1
+        return _filter_event(event)
+
+    events = list(stream_json(URL_TEMPLATE.format(limit, offset), "item",
+                              provider=BetclicOdds.PROVIDER, predicate=predicate))
+    return events, count
 
 
 def _parse_event(event: Json) -> Optional[OddsPair]:
@@ -56,11 +82,27 @@ def _parse_event(event: Json) -> Optional[OddsPair]:
                     eventname)
 
 
+def _parse_page(events: List[Json]) -> List[OddsPair]:
+    pairs = [_parse_event(e) for e in events]
+    return [p for p in pairs if p]  # prune None
+
+
+def iter_pairs() -> Generator[OddsPair, None, None]:
+    """Yield all betclic.pl's WTA and ATP odds pairs page by page, as soon as each page is
+    parsed.
+    """
+    count = 0
+    for events, _ in iter_pages(_get_page, PAGE_SIZE, size=lambda page: page[1]):
+        with METRICS.timed(BetclicOdds.PROVIDER, "parse"):
+            pairs = _parse_page(events)
+        METRICS.count("pairs", BetclicOdds.PROVIDER, "parse", len(pairs))
+        count += len(pairs)
+        yield from pairs
+    log.info(f"Got {count} {BetclicOdds.PROVIDER} odds pairs.")
+
+
 def getpairs() -> List[OddsPair]:
     """Return a list of all betclic.pl's WTA and ATP odds pairs.
     """
-    pairs = [_parse_event(e) for e in _get_events()]
-    pairs = [p for p in pairs if p]  # prune None
-    print(f"Got {len(pairs)} {BetclicOdds.PROVIDER} odds pairs.")
-    return pairs
+    return list(iter_pairs())
 
@@ -10,21 +10,35 @@
     this data.
 
 """
+import logging
 from datetime import datetime
-from typing import List, Optional
+from typing import Generator, List, Optional, Tuple
 
 from scrape import Odds, OddsPair
-from utils import Json, timed_request
-
-URL = "https://sportapis.ebetx.pl/SportOfferApi/api/sport/offer/v2/sports/offer"
+from metrics import METRICS
+from utils import Json, configure_limiter, get_cache, iter_pages, stream_json
 
+log = logging.getLogger(__name__)
 
-def _get_postdata() -> Json:
-    now = datetime.now()
+URL = "https://sportapis.ebetx.pl/SportOfferApi/api/sport/offer/v2/sports/offer"
+PAGE_SIZE = 50  # matches
+RATE = 5.0  # page requests per second (initial, adapted to how the site copes)
+configure_limiter(URL, RATE)
+
+
+def _get_postdata(offset: int = 0, limit: int = PAGE_SIZE) -> Json:
+    now = datetime.now().replace(microsecond=0)
+    cache = get_cache()
+    if cache is not None:
+        # rounded down to the cache's TTL, so the request (and its cache key) stays the same
+        # while a cached response would be fresh anyway (with no live filter, matches started
+        # within that time come along, but no more than with a cached response)
+        ttl = max(1, int(cache.ttl))
+        now = datetime.fromtimestamp(int(now.timestamp()) // ttl * ttl)
     year_after = datetime(now.year + 1, now.month, now.day, now.hour)
     return {
-        "Offset": 0,
-        "Limit": 50,
+        "Offset": offset,
+        "Limit": limit,
         "SportIds": [389],
         "CategoryIds": [],
         "LeagueIds": [],
@@ -36,19 +50,36 @@ def _get_postdata() -> Json:
 class BetxOdds(Odds):
     """ebetx.pl's odds.
     """
+    __slots__ = ()
     PROVIDER = "BetX"
 
     def __init__(self, contender: str, odds: float) -> None:
         super().__init__(contender, odds)
 
 
-def _get_matches() -> List[Json]:
-    data = timed_request(URL, postdata=_get_postdata(), return_json=True)["Response"][0]
-    tournaments = [t for item in data["Categories"] for t in item["Leagues"]]
-    tournaments = [t for t in tournaments if all(w not in t["Name"] for w in ("ITF", "Challenger"))]
-    matches = [item for t in tournaments for item in t["Matches"]]
-    print(f"Retrieved {len(matches)} match(es) for further parsing.")
-    return matches
+def _get_page(offset: int, limit: int) -> Tuple[List[Json], int]:
+    # return tournaments filtered as they're streamed along with the count of all their matches
+    # (pages are limited by matches and only a page shorter than the limit marks the last one)
+    count = 0
+
+    def predicate(tournament: Json) -> bool:
+        nonlocal count
+        count += len(tournament["Matches"])
+        return all(w not in tournament["Name"] for w in ("ITF", "Challenger"))
+
+    tournaments = list(stream_json(URL, "Response.item.Categories.item.Leagues.item",
+                                   provider=BetxOdds.PROVIDER,
+                                   postdata=_get_postdata(offset, limit), predicate=predicate))
+    return tournaments, count
+
+
+def _iter_matches() -> Generator[List[Json], None, None]:
+    # yield matches page by page
+    # pages come as tournaments (a tournament may span many pages)
+    for tournaments, _ in iter_pages(_get_page, PAGE_SIZE, size=lambda page: page[1]):
+        matches = [item for t in tournaments for item in t["Matches"]]
+        log.debug(f"Retrieved {len(matches)} match(es) for further parsing.")
+        yield matches
 
 
 def _parse_match(match: Json) -> Optional[OddsPair]:
@@ -62,10 +93,25 @@ def _parse_match(match: Json) -> Optional[OddsPair]:
                     event)
 
 
+def _parse_matches(matches: List[Json]) -> List[OddsPair]:
+    pairs = [_parse_match(m) for m in matches]
+    return [p for p in pairs if p]  # prune None
+
+
+def iter_pairs() -> Generator[OddsPair, None, None]:
+    """Yield all ebetx.pl's WTA and ATP odds pairs page by page, as soon as each page is parsed.
+    """
+    count = 0
+    for matches in _iter_matches():
+        with METRICS.timed(BetxOdds.PROVIDER, "parse"):
+            pairs = _parse_matches(matches)
+        METRICS.count("pairs", BetxOdds.PROVIDER, "parse", len(pairs))
+        count += len(pairs)
+        yield from pairs
+    log.info(f"Got {count} {BetxOdds.PROVIDER} odds pairs.")
+
+
 def getpairs() -> List[OddsPair]:
     """Return a list of all ebetx.pl's WTA and ATP odds pairs.
     """
-    pairs = [_parse_match(m) for m in _get_matches()]
-    pairs = [p for p in pairs if p]  # prune None
-    print(f"Got {len(pairs)} {BetxOdds.PROVIDER} odds pairs.")
-    return pairs
+    return list(iter_pairs())
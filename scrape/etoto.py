@@ -10,7 +10,7 @@
     this data.
 
 """
-from typing import List
+from typing import Generator, List
 
 from scrape import Odds, OddsPair, CategorizedEventsParser
 
@@ -21,16 +21,23 @@ EVENT_URL_TEMPLATE = "https://api.etoto.pl/rest/market/categories/multi/{}/event
 class EtotoOdds(Odds):
     """www.etoto.pl's odds.
     """
+    __slots__ = ()
     PROVIDER = "ETOTO"
 
     def __init__(self, contender: str, odds: float) -> None:
         super().__init__(contender, odds)
 
 
+def iter_pairs() -> Generator[OddsPair, None, None]:
+    """Yield all etoto.pl's WTA and ATP odds pairs as soon as they're parsed.
+    """
+    parser = CategorizedEventsParser(CATURL, EVENT_URL_TEMPLATE, EtotoOdds)
+    return parser.iter_pairs()
+
+
 def getpairs() -> List[OddsPair]:
     """Return a list of all betfan.pl's WTA and ATP odds pairs.
     """
-    parser = CategorizedEventsParser(CATURL, EVENT_URL_TEMPLATE, EtotoOdds)
-    return parser.getpairs()
+    return list(iter_pairs())
 
 
@@ -10,7 +10,7 @@
     this data.
 
 """
-from typing import List
+from typing import Generator, List
 
 from scrape import Odds, OddsPair, CategorizedEventsParser
 
@@ -21,16 +21,23 @@ EVENT_URL_TEMPLATE = "https://ewinner.pl/rest/market/categories/multi/{}/events"
 class EwinnerOdds(Odds):
     """ewinner.pl's odds.
     """
+    __slots__ = ()
     PROVIDER = "eWinner"
 
     def __init__(self, contender: str, odds: float) -> None:
         super().__init__(contender, odds)
 
 
+def iter_pairs() -> Generator[OddsPair, None, None]:
+    """Yield all ewinner.pl's WTA and ATP odds pairs as soon as they're parsed.
+    """
+    parser = CategorizedEventsParser(CATURL, EVENT_URL_TEMPLATE, EwinnerOdds)
+    return parser.iter_pairs()
+
+
 def getpairs() -> List[OddsPair]:
     """Return a list of all betfan.pl's WTA and ATP odds pairs.
     """
-    parser = CategorizedEventsParser(CATURL, EVENT_URL_TEMPLATE, EwinnerOdds)
-    return parser.getpairs()
+    return list(iter_pairs())
 
 
@@ -10,15 +10,19 @@
     this data.
 
 """
-from time import sleep
-from typing import Generator, List
+import logging
+import re
+from typing import Dict, Generator, List
 
-from bs4 import BeautifulSoup
-from bs4.element import Tag
+from bs4 import BeautifulSoup, SoupStrainer
 
 from scrape import Odds, OddsPair
 
-from utils import timed_request
+from metrics import METRICS
+from utils import DeadlineExceeded, configure_limiter, discover, invalidate_discovery, pipeline, \
+    timed_request
+
+log = logging.getLogger(__name__)
 
 # the usual approach of looking at what gets requested by the page failed here
 # not only because the data needed is not within jsons returned (oddly, it lurks in one of returned
@@ -29,7 +33,11 @@ from utils import timed_request
 # first one has to determine what are category ids and then request category-specific data
 
 MAINURL = "https://www.iforbet.pl/zaklady-bukmacherskie"
-THROTTLING_PERIOD = 0.7
+RATE = 1.5  # page requests per second (initial, adapted to how the site copes)
+configure_limiter(MAINURL, RATE)
+MAX_WORKERS = 4  # category pages requested concurrently
+# matches divs with any of these classes (be it tested against single classes or whole attribute)
+STRAINER = SoupStrainer("div", class_=re.compile(r"(?:^|\s)(?:outcomes-menu|event-rate)(?:\s|$)"))
 
 
 # ceased to work
@@ -73,43 +81,40 @@ def _get_cat_ids() -> List[int]:
 
 def urlgen() -> Generator[str, None, None]:
     template = "https://www.iforbet.pl/oferta/8/{}"
-    for catid in _get_cat_ids():
+    for catid in discover(MAINURL, _get_cat_ids):
         yield template.format(catid)
 
 
-def _get_event_divs() -> List[Tag]:
-    def validate_soup(bs: BeautifulSoup) -> bool:
-        # search in soup for element displaying e.g: TENIS >> WTA >> WTA CHICAGO
-        divs = bs.find_all("div", class_="left outcomes-menu uppercase tl")
-        if len(divs) < 2:
-            return False
-        ass = divs[1].find_all("a")
-        children = [*ass]
-        if len(children) < 3:
-            return False
-        tag = children[2]
-        # if it does not contain illegal words, it's OK
-        if not any(word in tag.text for word in ("ITF", "Challenger", "Klasyfikacja")):
-            return True
+def _validate_soup(bs: BeautifulSoup) -> bool:
+    # search in soup for element displaying e.g: TENIS >> WTA >> WTA CHICAGO
+    divs = bs.find_all("div", class_="left outcomes-menu uppercase tl")
+    if len(divs) < 2:
+        return False
+    ass = divs[1].find_all("a")
+    children = [*ass]
+    if len(children) < 3:
         return False
+    tag = children[2]
+    # if it does not contain illegal words, it's OK
+    if not any(word in tag.text for word in ("ITF", "Challenger", "Klasyfikacja")):
+        return True
+    return False
 
-    tags = []
-    for url in urlgen():
-        markup = timed_request(url, provider=ForbetOdds.PROVIDER)
-        soup = BeautifulSoup(markup, "lxml")
-        if validate_soup(soup):
-            tags += [tag for tag in soup.find_all("div", class_="event-rate")
-                     if tag.attrs["data-gamename"] == "Zwycięzca"]
-        print(f"Throttling for {int(THROTTLING_PERIOD * 1000)} ms..")
-        sleep(THROTTLING_PERIOD)
-        print("Resumed.")
 
-    return tags
+def _fetch_page(url: str) -> str:
+    try:
+        return timed_request(url, provider=ForbetOdds.PROVIDER, raise_for_status=True)
+    except DeadlineExceeded:
+        raise
+    except Exception:
+        invalidate_discovery(MAINURL)  # the category may be gone
+        raise
 
 
 class ForbetOdds(Odds):
     """www.iforbet.pl's odds.
     """
+    __slots__ = ("event",)
     PROVIDER = "ForBET"
 
     def __init__(self, contender: str, odds: float, event: str) -> None:
@@ -117,28 +122,64 @@ class ForbetOdds(Odds):
         self.event = event
 
 
-def getodds() -> List[ForbetOdds]:
+def _parse_page(markup: str) -> List[ForbetOdds]:
+    # run in a parsing worker process, hence module-level
+    # only the breadcrumb and the odds divs get parsed
+    soup = BeautifulSoup(markup, "lxml", parse_only=STRAINER)
+    if not _validate_soup(soup):
+        return []
     odds_list = []
-    for tag in _get_event_divs():
+    for tag in soup.find_all("div", class_="event-rate"):
+        if tag.attrs["data-gamename"] != "Zwycięzca":
+            continue
         contender = tag.attrs["data-outcomename"]
         if "/" in contender:
             continue  # prune doubles
         odds = tag.attrs["data-outcomeodds"]
         event = tag.attrs["data-eventname"]
         odds_list.append(ForbetOdds(contender, float(odds), event))
-    print(f"Got total number of {len(odds_list)} {ForbetOdds.PROVIDER} odds.")
     return odds_list
 
 
-def getpairs() -> List[OddsPair]:
-    pairs, odds_list = [], getodds()
-    for o in odds_list[:]:
-        complement = next((odds for odds in odds_list if o.contender in odds.event
-                           and o.contender != odds.contender), None)
-        if not complement:
+def pair(odds_list: List[ForbetOdds]) -> List[OddsPair]:
+    """Pair odds from 'odds_list' that belong to the same event.
+
+    Odds are indexed by their event name in one pass so pairing takes linear time.
+    """
+    index: Dict[str, List[ForbetOdds]] = {}
+    for o in odds_list:
+        index.setdefault(o.event, []).append(o)
+
+    pairs = []
+    for event, odds in index.items():
+        # the first outcome whose (normalized) contender is named in the event anchors the pair
+        anchor = next((o for o in odds if o.contender in event), None)
+        if not anchor:
             continue
-        else:
-            pairs.append(OddsPair(o, complement, o.event))
-            odds_list.remove(o)
-    print(f"Got {len(pairs)} {ForbetOdds.PROVIDER} odds pairs.")
+        complement = next((o for o in odds if o.contender != anchor.contender), None)
+        if complement:
+            pairs.append(OddsPair(anchor, complement, event))
     return pairs
+
+
+def iter_pairs() -> Generator[OddsPair, None, None]:
+    """Yield all iforbet.pl's WTA and ATP odds pairs category page by page, as soon as each page
+    is parsed.
+
+    An event's odds are all listed on one category page, so they're paired page by page.
+    """
+    count, events = 0, set()
+    # category pages get parsed in worker processes while the next ones are being fetched
+    for odds_list in pipeline(_fetch_page, _parse_page, urlgen(), ForbetOdds.PROVIDER,
+                              max_workers=MAX_WORKERS):
+        with METRICS.timed(ForbetOdds.PROVIDER, "pair"):
+            pairs = [p for p in pair(odds_list) if p.event not in events]
+            events.update(p.event for p in pairs)
+        METRICS.count("pairs", ForbetOdds.PROVIDER, "pair", len(pairs))
+        count += len(pairs)
+        yield from pairs
+    log.info(f"Got {count} {ForbetOdds.PROVIDER} odds pairs.")
+
+
+def getpairs() -> List[OddsPair]:
+    return list(iter_pairs())
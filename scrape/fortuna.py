@@ -10,53 +10,74 @@
     this data.
 
 """
-from typing import List, Tuple
+import logging
+from typing import Generator, List, Optional, Tuple
 
-from bs4 import BeautifulSoup
-from bs4.element import Tag
-import pandas as pd
+from lxml import etree, html
+from lxml.html import HtmlElement
 
 from scrape import Odds, OddsPair
-from utils import timed_request
+from metrics import METRICS
+from cache import ParseMemo
+from utils import memoize, pipeline, timed_request
+
+log = logging.getLogger(__name__)
 
 URL = "https://www.efortuna.pl/zaklady-bukmacherskie/tenis-mpl283"
 
 
-def _get_tables() -> List[Tuple[Tag, str]]:
+def _by_class(tag: str, class_: str) -> str:
+    """Return XPath selecting descendant 'tag' elements having 'class_' among their classes.
+    """
+    return f".//{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {class_} ')]"
+
+
+def _text(element: HtmlElement) -> str:
+    return " ".join(element.text_content().split())
+
+
+def _get_tables(markup: str) -> List[Tuple[HtmlElement, str]]:
     def prune(text: str) -> bool:
         return any(w in text for w in ("WTA", "ATP")) and all(w not in text
                                                               for w in ("ITF", "Chall", "debel",
                                                                         "końc."))
-    markup = timed_request(URL, provider=FortunaOdds.PROVIDER)
-    soup = BeautifulSoup(markup, "lxml")
-    sections = soup.select("section.competition-box")
-    pruned = [s for s in sections if s.find("span", class_="competition-name", text=prune)]
-    # e.g. "K-WTA Chicago 2, singiel"
-    events = [p.find("span", class_="competition-name").text for p in pruned]
-    new_events = []
-    for e in events:
-        _, second, *_ = e.split("-")
-        # new_event, e.g.: "WTA Chicago 2, singiel"
+    root = html.fromstring(markup)
+    tables = []
+    for section in root.xpath(_by_class("section", "competition-box")):
+        span = next((s for s in section.xpath(_by_class("span", "competition-name"))
+                     if prune(s.text_content())), None)
+        table = section.find(".//table")
+        if span is None or table is None:
+            continue
+        # e.g. "K-WTA Chicago 2, singiel"
+        _, second, *_ = span.text_content().split("-")
+        # e.g.: "WTA Chicago 2, singiel"
         first, _ = second.split(",")
-        # new_event, e.g.: "WTA Chicago 2"
-        new_events.append(first.strip())
-    print(f"Parsed {len(pruned)} table(s).")
-    return [(p.find("table"), e) for p, e in zip(pruned, new_events)]
+        # e.g.: "WTA Chicago 2"
+        tables.append((table, first.strip()))
+    log.debug(f"Parsed {len(tables)} table(s).")
+    return tables
 
 
 class FortunaOdds(Odds):
     """www.efortuna.pl's odds.
     """
+    __slots__ = ()
     PROVIDER = "Fortuna"
 
     def __init__(self, contender: str, odds: float) -> None:
         super().__init__(contender, odds)
 
 
-def _parse_table(table: Tag, event: str) -> List[OddsPair]:
-    def filter_rows(od1: float, od2: float) -> bool:
-        return bool(od1) and bool(od2)
+def _parse_odds(text: str) -> Optional[float]:
+    try:
+        odds = float(text.replace(",", "."))
+    except ValueError:
+        return None
+    return odds or None
+
 
+def _parse_table(table: HtmlElement, event: str) -> List[OddsPair]:
     def parse_name(nm: str) -> str:
         first, second, *_ = nm.split(".")
         second = second.lstrip(" - ")
@@ -64,23 +85,58 @@ def _parse_table(table: Tag, event: str) -> List[OddsPair]:
         firstparts, secondparts = reversed(first.split()), reversed(second.split())
         return f"{' '.join(firstparts)}, {' '.join(secondparts)}"
 
-    df = next(iter(pd.read_html(str(table))))
-    df = df[df[["1", "2"]].apply(lambda x: filter_rows(*x), axis=1)]
-    df = df.loc[~df.iloc[:, 0].str.contains("LIVE")]  # pruning LIVE events
-    names = df.iloc[:, 0].apply(parse_name)
-    odds1 = df["1"]
-    odds2 = df["2"]
+    rows = table.findall(".//tr")
+    if not rows:
+        return []
+    header = [_text(cell) for cell in rows[0].xpath("./th|./td")]
+    if "1" not in header or "2" not in header:
+        return []
+    idx1, idx2 = header.index("1"), header.index("2")
+
     pairs = []
-    for name, o1, o2 in zip(names, odds1, odds2):
-        name1, name2 = name.split(", ")
+    for row in rows[1:]:
+        cells = row.xpath("./th|./td")
+        if len(cells) <= max(idx1, idx2):
+            continue
+        name = _text(cells[0])
+        if "LIVE" in name:  # pruning LIVE events
+            continue
+        o1, o2 = _parse_odds(_text(cells[idx1])), _parse_odds(_text(cells[idx2]))
+        if not o1 or not o2:
+            continue
+        name1, name2 = parse_name(name).split(", ")
         pairs.append(OddsPair(FortunaOdds(name1, o1), FortunaOdds(name2, o2), event))
-    print(f"Got {len(pairs)} odds pair(s) from table.")
+    log.debug(f"Got {len(pairs)} odds pair(s) from table.")
     return pairs
 
 
+def _fetch_page(url: str) -> str:
+    return timed_request(url, provider=FortunaOdds.PROVIDER)
+
+
+def _parse_page(markup: str) -> List[OddsPair]:
+    # run in a parsing worker process, hence module-level
+    # the offer rarely stays the same as a whole, but most of its tables do, so unchanged tables
+    # reuse their former pairs (serializing a table is much quicker than parsing it)
+    return [p for t, e in _get_tables(markup)
+            for p in memoize(FortunaOdds.PROVIDER, (e, ParseMemo.fingerprint(etree.tostring(t))),
+                             _parse_table, t, e)]
+
+
+def iter_pairs() -> Generator[OddsPair, None, None]:
+    """Yield all efortuna.pl's WTA and ATP odds pairs as soon as they're parsed.
+
+    The whole offer comes on one page parsed at once (in a worker process, so it doesn't hold the
+    GIL other providers' threads need).
+    """
+    count = 0
+    for pairs in pipeline(_fetch_page, _parse_page, [URL], FortunaOdds.PROVIDER):
+        METRICS.count("pairs", FortunaOdds.PROVIDER, "parse", len(pairs))
+        count += len(pairs)
+        yield from pairs
+    log.info(f"Got total number of {count} {FortunaOdds.PROVIDER} odds pair(s).")
+
+
 def getpairs() -> List[OddsPair]:
-    tables = _get_tables()
-    pairs = [p for lst in [_parse_table(t, e) for t, e in tables] for p in lst]
-    print(f"Got total number of {len(pairs)} {FortunaOdds.PROVIDER} odds pair(s).")
-    return pairs
+    return list(iter_pairs())
 
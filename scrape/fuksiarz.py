@@ -10,7 +10,7 @@
     this data.
 
 """
-from typing import List
+from typing import Generator, List
 
 from scrape import CategorizedEventsParser, Odds, OddsPair
 
@@ -21,15 +21,22 @@ EVENT_URL_TEMPLATE = "https://fuksiarz.pl/rest/market/categories/multi/{}/events
 class FuksiarzOdds(Odds):
     """fuksiarz.pl's odds.
     """
+    __slots__ = ()
     PROVIDER = "Fuksiarz"
 
     def __init__(self, contender: str, odds: float) -> None:
         super().__init__(contender, odds)
 
 
+def iter_pairs() -> Generator[OddsPair, None, None]:
+    """Yield all fuksiarz.pl's WTA and ATP odds pairs as soon as they're parsed.
+    """
+    parser = CategorizedEventsParser(CATURL, EVENT_URL_TEMPLATE, FuksiarzOdds)
+    return parser.iter_pairs()
+
+
 def getpairs() -> List[OddsPair]:
     """Return a list of all betfan.pl's WTA and ATP odds pairs.
     """
-    parser = CategorizedEventsParser(CATURL, EVENT_URL_TEMPLATE, FuksiarzOdds)
-    return parser.getpairs()
+    return list(iter_pairs())
 
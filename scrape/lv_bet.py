@@ -10,24 +10,29 @@
     this data.
 
 """
-from typing import Dict, List, Optional
+import logging
+from time import perf_counter
+from typing import Dict, Generator, List, Optional
 
 from scrape import Odds, OddsPair
-from utils import Json, timed_request
+from metrics import METRICS
+from utils import Json, stream_json
+
+log = logging.getLogger(__name__)
 
 URL = "https://app.lvbet.pl/_api/v1/offer/matches/?is_live=false&lang=pl"
 
 
-def _get_matches() -> List[Json]:
-    data = timed_request(URL, provider=LvBetOdds.PROVIDER, return_json=True)
-    matches = [d for d in data if d["group"]["label"] == "tennis"]
-    print(f"Parsed {len(matches)} match(es).")
-    return matches
+def _iter_matches() -> Generator[Json, None, None]:
+    # the offer spans all sports, so it's streamed to keep only tennis matches decoded
+    return stream_json(URL, "item", provider=LvBetOdds.PROVIDER,
+                       predicate=lambda d: d["group"]["label"] == "tennis")
 
 
 class LvBetOdds(Odds):
     """lvbet.pl's odds.
     """
+    __slots__ = ()
     PROVIDER = "LV BET"
 
     def __init__(self, contender: str, odds: float) -> None:
@@ -70,12 +75,28 @@ def _parse_match(match: Json) -> Optional[OddsPair]:
     return OddsPair(*odds, event)
 
 
+def iter_pairs() -> Generator[OddsPair, None, None]:
+    """Yield all lvbet.pl's WTA and ATP odds pairs match by match, as soon as each match is
+    streamed in and parsed.
+    """
+    count, elapsed = 0, 0.0
+    try:
+        for match in _iter_matches():
+            start = perf_counter()
+            pair = _parse_match(match)
+            elapsed += perf_counter() - start
+            if pair:
+                count += 1
+                yield pair
+    finally:
+        # parsing is interleaved with streaming, so it's accounted for as one observation
+        METRICS.observe(LvBetOdds.PROVIDER, "parse", elapsed)
+        METRICS.count("pairs", LvBetOdds.PROVIDER, "parse", count)
+    log.info(f"Got total number of {count} {LvBetOdds.PROVIDER} odds pair(s).")
+
+
 def getpairs() -> List[OddsPair]:
-    matches = _get_matches()
-    pairs = [_parse_match(match) for match in matches]
-    pairs = [p for p in pairs if p]
-    print(f"Got total number of {len(pairs)} {LvBetOdds.PROVIDER} odds pair(s).")
-    return pairs
+    return list(iter_pairs())
 
 
 
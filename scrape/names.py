@@ -0,0 +1,218 @@
+"""
+
+    scrape.names.py
+    ~~~~~~~~~~~~~~~
+    Resolve bookie-specific spellings of player names into canonical player identities.
+
+    @author: z33k
+
+    NOTE: bookies spell the same player differently, e.g. "Iga Świątek", "Swiatek Iga" or
+    "I. Świątek". Names are folded (diacritics, case and punctuation disregarded) and split into
+    full name parts and initials, then matched against already known identities looked up through
+    a name part index (exact) and a trigram index (fuzzy), so resolving a name costs about the same
+    no matter how many identities are known.
+
+"""
+import unicodedata
+from collections import Counter
+from difflib import SequenceMatcher
+from functools import lru_cache
+from threading import Lock
+from typing import Dict, FrozenSet, List, Set, Tuple
+
+# letters NFKD doesn't decompose into a base letter and a combining mark
+_TRANSLITERATION = str.maketrans({"ł": "l", "ø": "o", "đ": "d", "ð": "d", "ß": "ss", "æ": "ae",
+                                  "œ": "oe", "ı": "i", "þ": "th"})
+TRIGRAM_THRESHOLD = 0.6  # min Jaccard similarity of name parts' trigrams for a fuzzy match
+FIRSTNAME_THRESHOLD = 0.75  # min similarity of first names' spellings (e.g. "Daria"/"Darya")
+
+
+@lru_cache(maxsize=65536)
+def fold(name: str) -> str:
+    """Return 'name' lowercased, stripped of diacritics and with punctuation replaced by spaces.
+    """
+    text = unicodedata.normalize("NFKD", name.lower().translate(_TRANSLITERATION))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join("".join(ch if ch.isalnum() else " " for ch in text).split())
+
+
+@lru_cache(maxsize=65536)
+def split(name: str) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+    """Return full name parts and initials of folded 'name'.
+
+    E.g. for "I. Świątek" it would be: ({"swiatek"}, {"i"}).
+    """
+    parts = fold(name).split()
+    return frozenset(p for p in parts if len(p) > 1), frozenset(p for p in parts if len(p) == 1)
+
+
+def trigrams(parts: FrozenSet[str]) -> Set[str]:
+    return {f" {p} "[i:i + 3] for p in parts for i in range(len(p))}
+
+
+@lru_cache(maxsize=65536)
+def _part_trigrams(part: str) -> FrozenSet[str]:
+    return frozenset(trigrams(frozenset([part])))
+
+
+def _jaccard(first: Set[str], second: Set[str]) -> float:
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+class Identity:
+    """Canonical player identity with all name parts and initials seen for it.
+    """
+    __slots__ = ("name", "parts", "initials")
+
+    def __init__(self, name: str, parts: FrozenSet[str], initials: FrozenSet[str]) -> None:
+        self.name = name
+        self.parts = parts
+        self.initials = initials
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(name='{self.name}')"
+
+    def match(self, parts: FrozenSet[str], initials: FrozenSet[str],
+              common: FrozenSet[str]) -> int:
+        """Score how well a name of 'parts' and 'initials' (sharing 'common' parts with this
+        identity, e.g. a surname) matches this player.
+
+        Return 2 if the name agrees with this player's spelled out (or equally abbreviated) name,
+        1 if it's merely compatible (e.g. initials agree with first names) and 0 if it's not this
+        player.
+        """
+        own_rest, rest = self.parts - common, parts - common
+        if own_rest and rest:
+            # both have first names spelled out, so they must be (nearly) the same
+            own_first, first = " ".join(sorted(own_rest)), " ".join(sorted(rest))
+            return 2 if SequenceMatcher(None, own_first, first).ratio() >= FIRSTNAME_THRESHOLD \
+                else 0
+        # at most one has a first name spelled out, so initials have to agree with it
+        own_initials = self.initials | {p[0] for p in own_rest}
+        other_initials = initials | {p[0] for p in rest}
+        if own_initials and other_initials and not (own_initials <= other_initials
+                                                    or other_initials <= own_initials):
+            return 0
+        return 1 if own_rest or rest else 2
+
+
+def same_player(name: str, other: str) -> bool:
+    """Tell whether 'name' and 'other' may be spellings of the same player.
+
+    They have to share a full name part (e.g. a surname) and agree on the rest of it (if spelled
+    out in both) or on initials, so e.g. "Swiatek", "I. Świątek" and "Swiatek Iga" all may be
+    "Iga Świątek".
+    """
+    parts, initials = split(name)
+    other_parts, other_initials = split(other)
+    common = parts & other_parts
+    return bool(common) and bool(Identity(other, other_parts, other_initials).match(
+        parts, initials, common))
+
+
+class PlayerResolver:
+    """Resolve spellings of player names into canonical names of player identities.
+
+    Results are memoised per spelling. Unknown spellings are matched against known identities
+    sharing a full name part with them or, failing that, similar enough by trigrams. The best
+    match wins. If there's no match (or the best one is ambiguous, e.g. "K. Pliskova" with both
+    Karolina and Kristyna known), a new identity is made.
+    """
+    def __init__(self) -> None:
+        self.identities: List[Identity] = []
+        self._memo: Dict[str, Identity] = {}
+        self._part_index: Dict[str, List[Identity]] = {}
+        self._trigram_index: Dict[str, List[str]] = {}  # trigrams to name parts having them
+        self._lock = Lock()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(identities={len(self.identities)}, " \
+               f"spellings={len(self._memo)})"
+
+    def __call__(self, name: str) -> str:
+        return self.resolve(name)
+
+    def resolve(self, name: str) -> str:
+        """Return canonical name of the player spelled as 'name'.
+        """
+        identity = self._memo.get(name)
+        if identity is None:
+            with self._lock:
+                identity = self._memo.get(name)
+                if identity is None:
+                    identity = self._memo[name] = self._resolve(name)
+        return identity.name
+
+    def _candidates(self, parts: FrozenSet[str], initials: FrozenSet[str]
+                    ) -> List[Tuple[Identity, int]]:
+        # exact blocking on full name parts first
+        seen: Dict[int, Identity] = {}
+        for part in parts:
+            for identity in self._part_index.get(part, ()):
+                seen.setdefault(id(identity), identity)
+        matched = [(i, i.match(parts, initials, parts & i.parts)) for i in seen.values()]
+        matched = [(i, score) for i, score in matched if score]
+        if matched or not parts:
+            return matched
+
+        # then fuzzy blocking on trigrams (e.g. for differently transliterated surnames)
+        similar = self._similar_parts(parts)
+        seen, commons, matched_parts = {}, {}, {}
+        for part, similar_parts in similar.items():
+            for similar_part in similar_parts:
+                for identity in self._part_index[similar_part]:
+                    seen.setdefault(id(identity), identity)
+                    # the identity's parts similar to the name's parts are taken as common
+                    commons.setdefault(id(identity), set()).add(similar_part)
+                    matched_parts.setdefault(id(identity), set()).add(part)
+        for key, identity in seen.items():
+            common = frozenset(commons[key])
+            rest = parts - matched_parts[key]
+            score = identity.match(rest | common, initials, common)
+            if score:
+                matched.append((identity, score))
+        return matched
+
+    def _similar_parts(self, parts: FrozenSet[str]) -> Dict[str, List[str]]:
+        # map 'parts' to known name parts similar enough by trigrams
+        # trigrams shared with known parts are counted off the index, so the similarity of each
+        # takes no set operations
+        similar = {}
+        for part in parts:
+            grams = _part_trigrams(part)
+            shared = Counter(p for gram in grams for p in self._trigram_index.get(gram, ()))
+            found = [p for p, count in shared.items()
+                     if count / (len(grams) + len(_part_trigrams(p)) - count)
+                     >= TRIGRAM_THRESHOLD]
+            if found:
+                similar[part] = found
+        return similar
+
+    def _resolve(self, name: str) -> Identity:
+        parts, initials = split(name)
+        matched = self._candidates(parts, initials)
+        if matched:
+            top = max(score for _, score in matched)
+            best = [identity for identity, score in matched if score == top]
+            if len(best) == 1:
+                self._extend(best[0], parts, initials)
+                return best[0]
+        identity = Identity(name, frozenset(), frozenset())
+        self.identities.append(identity)
+        self._extend(identity, parts, initials)
+        return identity
+
+    def _extend(self, identity: Identity, parts: FrozenSet[str],
+                initials: FrozenSet[str]) -> None:
+        new_parts = parts - identity.parts
+        # initials get superseded by full name parts starting with them
+        identity.parts |= new_parts
+        identity.initials = (identity.initials | initials) - {p[0] for p in identity.parts}
+        for part in new_parts:
+            if part not in self._part_index:  # a name part not seen before
+                for gram in _part_trigrams(part):
+                    self._trigram_index.setdefault(gram, []).append(part)
+            self._part_index.setdefault(part, []).append(identity)
+
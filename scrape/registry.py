@@ -0,0 +1,78 @@
+"""
+
+    scrape.registry.py
+    ~~~~~~~~~~~~~~~~~~
+    Registry of scraped bookies with their modules loaded lazily.
+
+    @author: z33k
+
+    NOTE: a provider's module (and its dependencies, e.g. bs4 or lxml) gets imported only when the
+    provider is first looked up, so scraping one bookie doesn't pay for importing all of them.
+
+"""
+import logging
+from importlib import import_module
+from threading import Lock
+from types import ModuleType
+from typing import Dict, Iterator, List, Mapping
+
+log = logging.getLogger(__name__)
+
+
+class ProviderRegistry(Mapping[str, ModuleType]):
+    """Read-only mapping of providers' names to their modules (imported on first lookup).
+
+    A provider's module has to expose getpairs() (and its streaming variant, iter_pairs()).
+    """
+    def __init__(self, modules: Dict[str, str]) -> None:
+        self._modules = dict(modules)  # names to dotted module paths
+        self._loaded: Dict[str, ModuleType] = {}
+        self._lock = Lock()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(providers={len(self)}, loaded={self.loaded})"
+
+    def __getitem__(self, name: str) -> ModuleType:
+        module = self._loaded.get(name)
+        if module is None:
+            if name not in self._modules:
+                raise KeyError(name)
+            with self._lock:
+                module = self._loaded.get(name)
+                if module is None:
+                    log.debug(f"Loading {name} provider from '{self._modules[name]}'...")
+                    module = self._loaded[name] = import_module(self._modules[name])
+        return module
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._modules)
+
+    def __len__(self) -> int:
+        return len(self._modules)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._modules  # no import needed to tell
+
+    @property
+    def loaded(self) -> List[str]:
+        return [name for name in self._modules if name in self._loaded]
+
+    def register(self, name: str, module: str) -> None:
+        """Register provider 'name' scraped by 'module' (a dotted path, e.g. "scrape.betclic").
+        """
+        with self._lock:
+            self._modules[name] = module
+            self._loaded.pop(name, None)
+
+
+PROVIDERS = ProviderRegistry({
+    "betclic": "scrape.betclic",
+    "betfan": "scrape.betfan",
+    "betx": "scrape.betx",
+    "etoto": "scrape.etoto",
+    "ewinner": "scrape.ewinner",
+    "forbet": "scrape.forbet",
+    "fortuna": "scrape.fortuna",
+    "fuksiarz": "scrape.fuksiarz",
+    "lv_bet": "scrape.lv_bet",
+})
@@ -0,0 +1,165 @@
+"""
+
+    scrape.serve.py
+    ~~~~~~~~~~~~~~~
+    Daemon scraping bookies on schedule and serving the latest odds over a local HTTP/JSON API.
+
+    @author: z33k
+
+    NOTE: usage e.g.: 'python -m scrape.serve betclic lv_bet -i 60 -I lv_bet=30'. Endpoints:
+    * GET /odds?player=&event=&provider= - the latest odds pairs (filters are optional and
+      repeatable; 'player' and 'event' match case- and diacritics-insensitive substrings)
+    * GET /providers - per-provider snapshot size and age
+    * GET /metrics - scraping metrics in Prometheus text format
+    Providers are always named by their registry names (e.g. "lv_bet"), both in filters and
+    in responses.
+
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from cli import add_common_arguments, configure_logging, parse_args, provider_seconds
+from metrics import METRICS
+from scrape import OddsPair
+from scrape.names import fold
+from scrape.watch import DEFAULT_INTERVAL, Watcher
+from utils import Json
+
+log = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8337
+
+
+class OddsServer(ThreadingHTTPServer):
+    """HTTP server of the latest odds snapshots kept by 'watcher'.
+    """
+    daemon_threads = True
+
+    def __init__(self, watcher: Watcher, host: str = DEFAULT_HOST,
+                 port: int = DEFAULT_PORT) -> None:
+        super().__init__((host, port), _Handler)
+        self.watcher = watcher
+
+    def __repr__(self) -> str:
+        host, port = self.server_address[:2]
+        return f"{self.__class__.__name__}(host='{host}', port={port}, " \
+               f"providers={list(self.watcher.providers)})"
+
+    def providers(self) -> Dict[str, Json]:
+        now = time.time()
+        result = {}
+        for provider in self.watcher.providers:
+            updated = self.watcher.updated[provider]
+            result[provider] = {
+                "pairs": len(self.watcher.snapshots[provider]),
+                "updated": updated,
+                "age": None if updated is None else round(now - updated, 3),
+            }
+        return result
+
+    def odds(self, players: List[str], events: List[str], providers: List[str]) -> Json:
+        """Return the latest odds pairs of 'providers' (all watched if empty) involving any of
+        'players' and held at any of 'events' (any if empty).
+        """
+        unknown = [p for p in providers if p not in self.watcher.snapshots]
+        if unknown:
+            raise ValueError(f"Unknown provider(s): {unknown}. Known: "
+                             f"{list(self.watcher.providers)}.")
+        providers = providers or list(self.watcher.providers)
+        players, events = [fold(p) for p in players], [fold(e) for e in events]
+
+        def match(pair: OddsPair) -> bool:
+            if players and not any(p in fold(c) for p in players for c in pair.contenders):
+                return False
+            return not events or any(e in fold(pair.event) for e in events)
+
+        status = self.providers()
+        # pairs name their providers the way the rest of the API does
+        pairs = [{**pair.to_json(), "provider": provider} for provider in providers
+                 for pair in self.watcher.snapshots[provider].values() if match(pair)]
+        return {"providers": {p: status[p] for p in providers}, "pairs": pairs}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: OddsServer
+
+    def _send(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, data: Json) -> None:
+        self._send(status, json.dumps(data, ensure_ascii=False).encode("utf-8"),
+                   "application/json; charset=utf-8")
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        if url.path == "/odds":
+            try:
+                data = self.server.odds(query.get("player", []), query.get("event", []),
+                                        query.get("provider", []))
+            except ValueError as e:
+                self._send_json(400, {"error": str(e)})
+                return
+            self._send_json(200, data)
+        elif url.path == "/providers":
+            self._send_json(200, self.server.providers())
+        elif url.path == "/metrics":
+            self._send(200, METRICS.to_prometheus().encode("utf-8"),
+                       "text/plain; version=0.0.4; charset=utf-8")
+        else:
+            self._send_json(404, {"error": f"Unknown path: '{url.path}'."})
+
+    def log_message(self, format: str, *args) -> None:
+        log.debug(f"{self.address_string()} - {format % args}")
+
+
+def serve(*providers: str, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+          interval: float = DEFAULT_INTERVAL,
+          intervals: Optional[Dict[str, float]] = None) -> None:
+    """Watch 'providers' (all known ones if not specified) and serve their latest odds on 'host'
+    and 'port' until interrupted.
+    """
+    with Watcher(*providers, interval=interval, intervals=intervals) as watcher:
+        server = OddsServer(watcher, host, port)
+        log.info(f"Serving odds of {len(watcher.providers)} provider(s) on "
+                 f"http://{host}:{server.server_address[1]}...")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            log.info("Shutting down...")
+        finally:
+            server.server_close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve the latest odds of polish tennis bookies.")
+    add_common_arguments(parser, "watch")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="(default: %(default)s)")
+    parser.add_argument("-p", "--port", type=int, default=DEFAULT_PORT,
+                        help="(default: %(default)s)")
+    parser.add_argument("-i", "--interval", type=float, default=DEFAULT_INTERVAL,
+                        help="seconds between scrapes of a provider (default: %(default)s)")
+    parser.add_argument("-I", "--provider-interval", type=provider_seconds, action="append",
+                        default=[], metavar="NAME=SECONDS",
+                        help="seconds between scrapes of a particular provider")
+    args = parse_args(parser, argv)
+
+    configure_logging(args.verbose, "%(asctime)s %(message)s")
+    serve(*args.providers, host=args.host, port=args.port, interval=args.interval,
+          intervals=dict(args.provider_interval))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
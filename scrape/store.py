@@ -0,0 +1,180 @@
+"""
+
+    scrape.store.py
+    ~~~~~~~~~~~~~~~
+    Append-only SQLite store of odds snapshots.
+
+    @author: z33k
+
+    NOTE: every sweep's odds pairs are appended in one batch (one transaction) and rows are never
+    updated, so the store holds full line history. Queries by player, event, provider and time
+    range are served by indexes. Players are indexed by their folded full name parts, so a player
+    is found no matter how a bookie ordered or abbreviated their name.
+
+"""
+import logging
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Lock
+from typing import Any, Iterable, List, Optional, Union
+
+from scrape import OddsPair
+from scrape.names import same_player, split
+
+log = logging.getLogger(__name__)
+
+DEFAULT_PATH = Path.home() / ".local" / "share" / "tenbook" / "odds.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sweeps (
+    id INTEGER PRIMARY KEY,
+    timestamp REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS odds (
+    id INTEGER PRIMARY KEY,
+    sweep_id INTEGER NOT NULL REFERENCES sweeps(id),
+    timestamp REAL NOT NULL,
+    provider TEXT NOT NULL,
+    event TEXT NOT NULL,
+    home TEXT NOT NULL,
+    away TEXT NOT NULL,
+    home_odds REAL NOT NULL,
+    away_odds REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS players (
+    odds_id INTEGER NOT NULL REFERENCES odds(id),
+    part TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS odds_sweep ON odds(sweep_id, provider);
+CREATE INDEX IF NOT EXISTS odds_timestamp ON odds(timestamp);
+CREATE INDEX IF NOT EXISTS odds_provider ON odds(provider, timestamp);
+CREATE INDEX IF NOT EXISTS odds_event ON odds(event, timestamp);
+CREATE INDEX IF NOT EXISTS players_part ON players(part, odds_id);
+"""
+
+
+@dataclass
+class Record:
+    """Stored odds pair.
+    """
+    timestamp: float
+    provider: str
+    event: str
+    home: str
+    away: str
+    home_odds: float
+    away_odds: float
+
+    @property
+    def margin(self) -> float:
+        return 1 / self.home_odds + 1 / self.away_odds - 1
+
+
+class OddsStore:
+    """Append-only store of odds pairs' snapshots in a SQLite database at 'path'.
+    """
+    def __init__(self, path: Union[str, Path] = DEFAULT_PATH) -> None:
+        self.path = Path(path)
+        if str(path) != ":memory:":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")  # readers don't block the appending writer
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = Lock()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(path='{self.path}')"
+
+    def __enter__(self) -> "OddsStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def append(self, pairs: Iterable[OddsPair], timestamp: Optional[float] = None) -> int:
+        """Append 'pairs' of one sweep (taken at 'timestamp', now if not specified) in one batch.
+
+        Return id of the stored sweep.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock, self._conn:
+            sweep_id = self._conn.execute("INSERT INTO sweeps (timestamp) VALUES (?)",
+                                          (timestamp,)).lastrowid
+            rows = [(sweep_id, timestamp, p.home.PROVIDER or "", p.event, p.home.contender,
+                     p.away.contender, p.home.odds, p.away.odds) for p in pairs]
+            self._conn.executemany(
+                "INSERT INTO odds (sweep_id, timestamp, provider, event, home, away, home_odds, "
+                "away_odds) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            # ids of the sweep's rows ascend in order of insertion
+            ids = self._conn.execute("SELECT id FROM odds WHERE sweep_id = ? ORDER BY id",
+                                     (sweep_id,)).fetchall()
+            parts = [(odds_id, part) for (odds_id,), row in zip(ids, rows)
+                     for part in split(row[4])[0] | split(row[5])[0]]
+            self._conn.executemany("INSERT INTO players VALUES (?, ?)", parts)
+        log.info(f"Stored {len(rows)} odds pair(s) of sweep #{sweep_id}.")
+        return sweep_id
+
+    def query(self, player: str = "", event: str = "", provider: str = "",
+              since: Optional[float] = None, until: Optional[float] = None,
+              limit: Optional[int] = None) -> List[Record]:
+        """Return stored odds pairs matching all specified criteria ordered by time.
+
+        'player' is matched against both contenders regardless of diacritics, case, order of name
+        parts and abbreviations (see names.same_player()), 'event' and 'provider' are matched
+        exactly, 'since' and 'until' are inclusive timestamps.
+        """
+        conditions: List[str] = []
+        params: List[Any] = []
+        if player:
+            # rows sharing a full name part with 'player' are looked up here and sifted below
+            parts = sorted(split(player)[0])
+            conditions.append(f"id IN (SELECT odds_id FROM players WHERE part IN "
+                              f"({', '.join('?' * len(parts))}))")
+            params += parts
+        if event:
+            conditions.append("event = ?")
+            params.append(event)
+        if provider:
+            conditions.append("provider = ?")
+            params.append(provider)
+        if since is not None:
+            conditions.append("timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("timestamp <= ?")
+            params.append(until)
+        sql = "SELECT timestamp, provider, event, home, away, home_odds, away_odds FROM odds"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY timestamp"
+        if limit is not None and not player:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        records = [Record(*row) for row in rows]
+        if player:
+            records = [r for r in records
+                       if same_player(player, r.home) or same_player(player, r.away)]
+            records = records[:limit] if limit is not None else records
+        return records
+
+    def latest(self, provider: str = "") -> List[Record]:
+        """Return odds pairs of the latest stored sweep (that included 'provider' if specified).
+        """
+        sql = "SELECT MAX(sweep_id) FROM odds" + (" WHERE provider = ?" if provider else "")
+        with self._lock:
+            (sweep_id,) = self._conn.execute(sql, (provider,) if provider else ()).fetchone()
+            if sweep_id is None:
+                return []
+            sql = "SELECT timestamp, provider, event, home, away, home_odds, away_odds FROM odds " \
+                  "WHERE sweep_id = ?" + (" AND provider = ?" if provider else "")
+            params = (sweep_id, provider) if provider else (sweep_id,)
+            rows = self._conn.execute(sql, params).fetchall()
+        return [Record(*row) for row in rows]
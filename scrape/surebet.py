@@ -0,0 +1,130 @@
+"""
+
+    scrape.surebet.py
+    ~~~~~~~~~~~~~~~~~
+    Compare odds for the same match across bookies and find surebets (arbitrage opportunities).
+
+    @author: z33k
+
+"""
+import logging
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from scrape import Odds, OddsPair, percent
+from scrape.names import PlayerResolver
+
+log = logging.getLogger(__name__)
+
+PlayerKey = Callable[[str], str]
+
+
+def player_key(contender: str) -> str:
+    """Return a bookie-agnostic key for 'contender'.
+
+    Diacritics, case, punctuation and name parts' order are disregarded, so e.g. "Iga Świątek" and
+    "SWIATEK Iga" get the same key.
+    """
+    text = unicodedata.normalize("NFKD", contender)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    text = "".join(ch if ch.isalnum() else " " for ch in text)
+    return " ".join(sorted(text.split()))
+
+
+@dataclass
+class MatchOdds:
+    """Best odds for one match across all bookies offering it.
+    """
+    home: Odds
+    away: Odds
+    event: str = ""
+    pairs: List[OddsPair] = field(default_factory=list)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}([{self.home} @{self.home.PROVIDER}, " \
+               f"{self.away} @{self.away.PROVIDER}], providers={len(self.providers)}, " \
+               f"margin={self.marginstr})"
+
+    @property
+    def contenders(self) -> Tuple[str, str]:
+        return self.home.contender, self.away.contender
+
+    @property
+    def providers(self) -> List[str]:
+        return sorted({p.home.PROVIDER for p in self.pairs})
+
+    @property
+    def margin(self) -> float:
+        """Return combined margin of the best odds. Negative margin means a surebet.
+        """
+        return self.home.as_percent + self.away.as_percent - 1
+
+    @property
+    def marginstr(self) -> str:
+        return percent(self.margin)
+
+    @property
+    def is_surebet(self) -> bool:
+        return self.margin < 0
+
+    @property
+    def profit(self) -> float:
+        """Return guaranteed return on total stake (negative if there's no surebet).
+        """
+        return 1 / (1 + self.margin) - 1
+
+    def stakes(self, total: float = 100.0) -> Tuple[float, float]:
+        """Split 'total' stake between home and away so that the payout is equal either way.
+        """
+        overround = self.home.as_percent + self.away.as_percent
+        return (total * self.home.as_percent / overround,
+                total * self.away.as_percent / overround)
+
+
+def compare(pairs: Iterable[OddsPair], key: Optional[PlayerKey] = None,
+            min_providers: int = 2) -> List[MatchOdds]:
+    """Join 'pairs' coming from many bookies on the match and return the best odds for each match
+    offered by at least 'min_providers' bookies, ranked by combined margin (best first).
+
+    The join is done on a hash index of contenders' keys, so it takes linear time. Keys are
+    canonical player names resolved by a new names.PlayerResolver (so differently abbreviated or
+    transliterated names get joined too) unless another 'key' is specified (e.g. a resolver kept
+    between sweeps or the exact player_key()).
+    """
+    key = key or PlayerResolver()
+    index: Dict[Tuple[str, str], Tuple[Dict[str, Odds], List[OddsPair]]] = {}
+    for pair in pairs:
+        homekey, awaykey = key(pair.home.contender), key(pair.away.contender)
+        if homekey == awaykey:
+            continue
+        matchkey = (homekey, awaykey) if homekey < awaykey else (awaykey, homekey)
+        best, matched = index.setdefault(matchkey, ({}, []))
+        matched.append(pair)
+        for playerkey, odds in ((homekey, pair.home), (awaykey, pair.away)):
+            current = best.get(playerkey)
+            if current is None or odds.odds > current.odds:
+                best[playerkey] = odds
+
+    matches = []
+    for (firstkey, secondkey), (best, matched) in index.items():
+        if len({p.home.PROVIDER for p in matched}) < min_providers:
+            continue
+        # orient the best odds the way the first bookie listed the match
+        if key(matched[0].home.contender) == firstkey:
+            home, away = best[firstkey], best[secondkey]
+        else:
+            home, away = best[secondkey], best[firstkey]
+        event = next((p.event for p in matched if p.event), "")
+        matches.append(MatchOdds(home, away, event, matched))
+    matches.sort(key=lambda m: m.margin)
+    return matches
+
+
+def surebets(pairs: Iterable[OddsPair], key: Optional[PlayerKey] = None) -> List[MatchOdds]:
+    """Return surebets found in 'pairs' coming from many bookies, the most profitable first.
+    """
+    surebets_ = [m for m in compare(pairs, key=key) if m.is_surebet]
+    log.info(f"Found {len(surebets_)} surebet(s).")
+    return surebets_
+
@@ -0,0 +1,138 @@
+"""
+
+    scrape.sweep.py
+    ~~~~~~~~~~~~~~~
+    Scrape all (or selected) bookies concurrently.
+
+    @author: z33k
+
+    NOTE: each provider runs in its own thread (its requests are still spaced out by its host's
+    rate limiter) so the sweep as a whole takes about as long as the slowest bookie. With
+    a timeout, the sweep takes no longer than that: stragglers are given up on (their requests
+    get cancelled at the deadline) and whatever they've yielded so far is kept as partial results.
+    Providers' threads are daemonic, so a straggler doesn't keep the process alive either.
+
+"""
+import logging
+from dataclasses import dataclass, field
+from threading import Thread
+from time import monotonic
+from typing import Dict, List, Optional
+
+from contexttimer import Timer
+
+from scrape import OddsPair
+from scrape.registry import PROVIDERS
+from utils import deadline
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class ProviderResult:
+    """Result of scraping one provider.
+    """
+    provider: str
+    pairs: List[OddsPair]
+    elapsed: float  # seconds
+    completed: bool = True
+    error: Optional[str] = None  # why it hasn't completed
+
+    def __repr__(self) -> str:
+        repr_ = f"{self.__class__.__name__}(provider='{self.provider}', " \
+                f"pairs={len(self.pairs)}, elapsed={self.elapsed:.3f}"
+        return repr_ + (")" if self.completed else f", error={self.error!r})")
+
+
+@dataclass
+class SweepResult:
+    """Result of scraping many providers at once.
+    """
+    results: List[ProviderResult] = field(default_factory=list)
+    elapsed: float = 0.0  # seconds
+
+    @property
+    def pairs(self) -> List[OddsPair]:
+        return [p for result in self.results for p in result.pairs]
+
+    @property
+    def timings(self) -> Dict[str, float]:
+        return {result.provider: result.elapsed for result in self.results}
+
+    @property
+    def completed(self) -> List[str]:
+        return [result.provider for result in self.results if result.completed]
+
+    @property
+    def incomplete(self) -> List[str]:
+        return [result.provider for result in self.results if not result.completed]
+
+
+def _scrape(name: str, pairs: List[OddsPair], at: Optional[float], timings: Dict[str, float],
+            errors: Dict[str, Exception]) -> None:
+    # collect into 'pairs', so whatever's been yielded is there even if this never finishes
+    with Timer() as t:
+        try:
+            with deadline(None if at is None else at - monotonic()):
+                for pair in PROVIDERS[name].iter_pairs():
+                    pairs.append(pair)
+        except Exception as e:
+            errors[name] = e
+        finally:
+            timings[name] = t.elapsed
+
+
+def sweep(*providers: str, timeout: Optional[float] = None,
+          timeouts: Optional[Dict[str, float]] = None) -> SweepResult:
+    """Scrape 'providers' (all known ones if not specified) concurrently.
+
+    The whole sweep is given 'timeout' seconds and particular providers - 'timeouts' (no limits
+    if not specified). A provider that fails or runs out of time is reported as incomplete (with
+    the pairs it's yielded so far) instead of failing the whole sweep.
+
+    Return a SweepResult object holding the merged odds pairs and per-provider timing.
+    """
+    providers = providers or tuple(PROVIDERS)
+    unknown = [p for p in providers if p not in PROVIDERS]
+    if unknown:
+        raise ValueError(f"Unknown provider(s): {unknown}. Known: {list(PROVIDERS)}.")
+    timeouts = timeouts or {}
+    collected: Dict[str, List[OddsPair]] = {p: [] for p in providers}
+    timings: Dict[str, float] = {}
+    errors: Dict[str, Exception] = {}
+    threads: Dict[str, Thread] = {}
+    deadlines: Dict[str, Optional[float]] = {}
+    with Timer() as t:
+        start = monotonic()
+        for provider in providers:
+            limits = [s for s in (timeout, timeouts.get(provider)) if s is not None]
+            at = deadlines[provider] = start + min(limits) if limits else None
+            threads[provider] = Thread(
+                target=_scrape, args=(provider, collected[provider], at, timings, errors),
+                name=f"sweep-{provider}", daemon=True)
+            threads[provider].start()
+        for provider, thread in threads.items():
+            # stragglers aren't waited for past their deadlines (whatever doesn't check the
+            # deadline, e.g. CPU-bound parsing, may outlast it)
+            at = deadlines[provider]
+            thread.join(None if at is None else max(0.0, at - monotonic()))
+
+    results = []
+    for provider, thread in threads.items():
+        pairs = list(collected[provider])
+        if thread.is_alive():  # so it has a deadline, that's passed
+            results.append(ProviderResult(provider, pairs, deadlines[provider] - start, False,
+                                          "timed out"))
+        elif provider in errors:
+            results.append(ProviderResult(provider, pairs, timings[provider], False,
+                                          repr(errors[provider])))
+        else:
+            results.append(ProviderResult(provider, pairs, timings[provider]))
+    result = SweepResult(results, t.elapsed)
+    for r in result.results:
+        if not r.completed:
+            log.warning(f"{r.provider} hasn't completed ({r.error}). Kept {len(r.pairs)} odds "
+                        f"pair(s) it got so far.")
+    log.info(f"Swept {len(result.completed)}/{len(providers)} provider(s) for "
+             f"{len(result.pairs)} odds pair(s) in {t.elapsed:.3f} seconds.")
+    return result
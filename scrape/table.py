@@ -0,0 +1,120 @@
+"""
+
+    scrape.table.py
+    ~~~~~~~~~~~~~~~
+    Columnar odds table for bulk (vectorized) odds math.
+
+    @author: z33k
+
+"""
+from typing import Iterable, Sequence, Union
+
+import numpy as np
+
+from scrape import OddsPair
+
+COLUMNS = ("home", "away", "home_odds", "away_odds", "provider", "event")
+SORT_KEYS = ("margin", "spread", "home_odds", "away_odds", "home_percent", "away_percent")
+
+
+class OddsTable:
+    """Odds pairs laid out in columns (NumPy arrays), one row per pair.
+
+    Margins, spreads, implied probabilities and sort orders are computed for all rows at once.
+    """
+    def __init__(self, pairs: Sequence[OddsPair]) -> None:
+        self.pairs = list(pairs)
+        size = len(self.pairs)
+        self.home = np.array([p.home.contender for p in self.pairs], dtype=object)
+        self.away = np.array([p.away.contender for p in self.pairs], dtype=object)
+        self.home_odds = np.fromiter((p.home.odds for p in self.pairs), dtype=float, count=size)
+        self.away_odds = np.fromiter((p.away.odds for p in self.pairs), dtype=float, count=size)
+        self.provider = np.array([p.home.PROVIDER for p in self.pairs], dtype=object)
+        self.event = np.array([p.event for p in self.pairs], dtype=object)
+
+    @classmethod
+    def from_pairs(cls, *pair_lists: Iterable[OddsPair]) -> "OddsTable":
+        """Build a table from any number of odds pairs' iterables (e.g. one per provider).
+        """
+        return cls([p for pairs in pair_lists for p in pairs])
+
+    def __len__(self) -> int:
+        return len(self.pairs)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(rows={len(self)}, " \
+               f"providers={sorted(set(self.provider))})"
+
+    def __getitem__(self, index: Union[slice, Sequence[int], np.ndarray]) -> "OddsTable":
+        """Return a table made of rows selected by 'index' (a slice, an array of indices or
+        a boolean mask).
+        """
+        if not isinstance(index, slice):
+            index = np.asarray(index)
+            index = np.flatnonzero(index) if index.dtype == bool else index.astype(np.intp)
+        table = object.__new__(OddsTable)
+        pairs = np.empty(len(self.pairs), dtype=object)
+        pairs[:] = self.pairs
+        table.pairs = list(pairs[index])
+        for column in COLUMNS:
+            setattr(table, column, getattr(self, column)[index])
+        return table
+
+    @property
+    def home_percent(self) -> np.ndarray:
+        """Return implied probabilities of home contenders winning.
+        """
+        return 1 / self.home_odds
+
+    @property
+    def away_percent(self) -> np.ndarray:
+        """Return implied probabilities of away contenders winning.
+        """
+        return 1 / self.away_odds
+
+    @property
+    def margin(self) -> np.ndarray:
+        return self.home_percent + self.away_percent - 1
+
+    @property
+    def spread(self) -> np.ndarray:
+        return np.abs(self.home_odds - self.away_odds)
+
+    @property
+    def fair_home_percent(self) -> np.ndarray:
+        """Return implied probabilities of home contenders winning with the margin taken out.
+        """
+        return self.home_percent / (self.margin + 1)
+
+    @property
+    def fair_away_percent(self) -> np.ndarray:
+        """Return implied probabilities of away contenders winning with the margin taken out.
+        """
+        return self.away_percent / (self.margin + 1)
+
+    def argsort(self, by: str = "spread", descending=False) -> np.ndarray:
+        """Return indices that sort the table by 'by' column.
+        """
+        if by not in SORT_KEYS:
+            raise ValueError(f"Can't sort by '{by}'. Sortable columns: {SORT_KEYS}.")
+        # stable sort, so rows with equal values keep their order
+        indices = np.argsort(getattr(self, by), kind="stable")
+        return indices[::-1] if descending else indices
+
+    def sort(self, by: str = "spread", descending=False) -> "OddsTable":
+        return self[self.argsort(by, descending)]
+
+    def where(self, provider: str = "", event: str = "", contender: str = "") -> "OddsTable":
+        """Return rows matching all of specified 'provider', 'event' and 'contender' (part of name).
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if provider:
+            mask &= self.provider == provider
+        if event:
+            mask &= np.fromiter((event in e for e in self.event), dtype=bool, count=len(self))
+        if contender:
+            mask &= np.fromiter((contender in h or contender in a
+                                 for h, a in zip(self.home, self.away)), dtype=bool,
+                                count=len(self))
+        return self[mask]
+
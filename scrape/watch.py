@@ -0,0 +1,157 @@
+"""
+
+    scrape.watch.py
+    ~~~~~~~~~~~~~~~
+    Watch bookies continuously and emit only odds changes.
+
+    @author: z33k
+
+"""
+import logging
+import time
+from dataclasses import dataclass
+from queue import Empty, Queue
+from threading import Event, Thread
+from typing import Callable, Dict, Generator, Iterable, List, Optional, Tuple
+
+from cache import ParseMemo
+from scrape import OddsPair
+from scrape.registry import PROVIDERS
+from utils import set_parse_memo
+
+log = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 60.0  # seconds
+
+PairKey = Tuple[Optional[str], str, str]
+
+
+@dataclass
+class Delta:
+    """Change of one odds pair between two consecutive snapshots of a provider's offer.
+    """
+    kind: str  # "added", "removed" or "changed"
+    pair: OddsPair  # the current pair (or the last known one if removed)
+    previous: Optional[OddsPair] = None  # the former pair (if changed)
+
+    def __repr__(self) -> str:
+        if self.kind == "changed":
+            return f"{self.__class__.__name__}(kind='{self.kind}', pair={self.pair}, " \
+                   f"previous={self.previous})"
+        return f"{self.__class__.__name__}(kind='{self.kind}', pair={self.pair})"
+
+
+def pair_key(pair: OddsPair) -> PairKey:
+    """Return key identifying 'pair's match within one provider's offer.
+    """
+    return (pair.home.PROVIDER, *sorted(pair.contenders))
+
+
+def diff(snapshot: Dict[PairKey, OddsPair],
+         pairs: Iterable[OddsPair]) -> Tuple[Dict[PairKey, OddsPair], List[Delta]]:
+    """Compare 'pairs' with the previous 'snapshot'.
+
+    Return the new snapshot and the list of deltas between the two.
+    """
+    new_snapshot = {pair_key(p): p for p in pairs}
+    deltas = []
+    for key, pair in new_snapshot.items():
+        previous = snapshot.get(key)
+        if previous is None:
+            deltas.append(Delta("added", pair))
+        elif previous != pair:
+            deltas.append(Delta("changed", pair, previous))
+    deltas += [Delta("removed", pair) for key, pair in snapshot.items()
+               if key not in new_snapshot]
+    return new_snapshot, deltas
+
+
+class Watcher:
+    """Poll providers, each on its own interval, and emit only deltas of their offers.
+
+    Deltas are passed to 'callback' (together with the provider's name) or, if there's no
+    callback, can be consumed with stream().
+
+    Most of an offer stays the same between polls, so while watching, parse results get memoised
+    (see utils.set_parse_memo()) unless 'parse_memo' is False.
+    """
+    def __init__(self, *providers: str, interval: float = DEFAULT_INTERVAL,
+                 intervals: Optional[Dict[str, float]] = None,
+                 callback: Optional[Callable[[str, List[Delta]], None]] = None,
+                 parse_memo: bool = True) -> None:
+        self.providers = providers or tuple(PROVIDERS)
+        unknown = [p for p in self.providers if p not in PROVIDERS]
+        if unknown:
+            raise ValueError(f"Unknown provider(s): {unknown}. Known: {list(PROVIDERS)}.")
+        self.intervals = {p: (intervals or {}).get(p, interval) for p in self.providers}
+        self.callback = callback
+        self.parse_memo = ParseMemo() if parse_memo else None
+        self.snapshots: Dict[str, Dict[PairKey, OddsPair]] = {p: {} for p in self.providers}
+        self.updated: Dict[str, Optional[float]] = {p: None for p in self.providers}  # timestamps
+        self._queue: "Queue[Tuple[str, List[Delta]]]" = Queue()
+        self._stopped = Event()
+        self._threads: List[Thread] = []
+
+    def __enter__(self) -> "Watcher":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _poll(self, provider: str) -> None:
+        while not self._stopped.is_set():
+            try:
+                pairs = PROVIDERS[provider].getpairs()
+            except Exception as e:
+                log.warning(f"Polling {provider} failed with: {e!r}. Retrying in "
+                            f"{self.intervals[provider]} second(s)...")
+            else:
+                self.snapshots[provider], deltas = diff(self.snapshots[provider], pairs)
+                self.updated[provider] = time.time()
+                log.info(f"Got {len(deltas)} {provider} odds delta(s).")
+                if deltas:
+                    if self.callback:
+                        self.callback(provider, deltas)
+                    else:
+                        self._queue.put((provider, deltas))
+            self._stopped.wait(self.intervals[provider])
+
+    def start(self) -> None:
+        if self.parse_memo is not None:
+            set_parse_memo(self.parse_memo)
+        self._stopped.clear()
+        self._threads = [Thread(target=self._poll, args=(p,), name=f"watch-{p}", daemon=True)
+                         for p in self.providers]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        """Stop polling (providers being scraped at the moment finish their current sweep first).
+        """
+        self._stopped.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self.parse_memo is not None:
+            set_parse_memo(None)
+
+    def stream(self) -> Generator[Tuple[str, Delta], None, None]:
+        """Yield (provider, delta) tuples as they come until stopped.
+        """
+        while not self._stopped.is_set() or not self._queue.empty():
+            try:
+                provider, deltas = self._queue.get(timeout=0.5)
+            except Empty:
+                continue
+            for delta in deltas:
+                yield provider, delta
+
+
+def watch(*providers: str, interval: float = DEFAULT_INTERVAL,
+          intervals: Optional[Dict[str, float]] = None) -> Generator[Tuple[str, Delta], None, None]:
+    """Watch 'providers' (all known ones if not specified) and yield their odds deltas as they
+    come.
+    """
+    with Watcher(*providers, interval=interval, intervals=intervals) as watcher:
+        yield from watcher.stream()
@@ -7,28 +7,663 @@
     @author: z33k
 
 """
-from typing import Any, Dict, List, Optional, Union
+import json
+import logging
+import multiprocessing
+import os
+import random
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, \
+    ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from email.utils import parsedate_to_datetime
+from threading import Lock
+from time import monotonic, perf_counter, sleep, time
+from typing import Any, Callable, Dict, Generator, Hashable, Iterable, List, Optional, Tuple, \
+    TypeVar, Union
+from urllib.parse import urlsplit
 
 import requests
-from contexttimer import Timer
+from requests.adapters import HTTPAdapter
+
+from archive import Recorder, Replayer
+from cache import CategoryCache, ParseMemo, ResponseCache
+from metrics import METRICS
 
 Json = Dict[str, Any]
+T = TypeVar("T")
+R = TypeVar("R")
 
+CONNECT_TIMEOUT = 5.0  # seconds
+READ_TIMEOUT = 30.0  # seconds
+POOL_SIZE = 10  # max connections kept alive per host
+MAX_PAGE_WORKERS = 4  # pages of a paginated resource requested concurrently
+DEFAULT_RATE = 2.0  # requests per second to a host with no rate limiter configured
+MAX_SPEEDUP = 4.0  # how many times faster than configured a rate limiter may get
+MAX_SLOWDOWN = 8.0  # how many times slower than configured a rate limiter may get
+SPEEDUP_STEP = 0.05  # fraction of configured rate added with every successful request
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5  # seconds
+MAX_BACKOFF = 30.0  # seconds
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+PARSE_PROCESSES = min(4, os.cpu_count() or 1)  # 0 means parsing in threads (no process pool)
 
-def timed_request(url: str, provider="", postdata: Optional[Json] = None,
-                  return_json=False) -> Union[List[Json], Json, str]:
-    if provider:
-        print(f"Retrieving data from {provider} servers...")
+try:
+    import ijson  # optional: enables stream_json() to parse responses incrementally
+except ImportError:
+    ijson = None
+
+try:
+    import brotli  # noqa: F401 (urllib3 decodes 'br' responses only if this is available)
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+log = logging.getLogger(__name__)
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = Lock()
+_limiters: Dict[str, "RateLimiter"] = {}
+_limiters_lock = Lock()
+_cache: Optional[ResponseCache] = None
+_recorder: Optional[Recorder] = None
+_replayer: Optional[Replayer] = None
+_category_cache: Optional[CategoryCache] = CategoryCache()
+_parse_memo: Optional[ParseMemo] = None
+_MISSING = object()
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)  # monotonic time
+_parse_pool: Optional[ProcessPoolExecutor] = None
+_parse_pool_lock = Lock()
+
+
+def _new_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, pool_block=True)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Accept-Encoding": ACCEPT_ENCODING, "Connection": "keep-alive"})
+    return session
+
+
+def get_session(url: str) -> requests.Session:
+    """Return a keep-alive session shared by all requests to the host of 'url'.
+
+    Sessions (and their connection pools) are thread-safe to share, so both the sequential and the
+    concurrent scrape paths reuse the same connections.
+    """
+    host = urlsplit(url).netloc
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = _sessions[host] = _new_session()
+    return session
+
+
+def close_sessions() -> None:
+    """Close all pooled sessions (and their connections).
+    """
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+def set_cache(cache: Optional[ResponseCache]) -> None:
+    """Make all subsequent requests go through 'cache' (or through no cache if None).
+    """
+    global _cache
+    _cache = cache
+
+
+def get_cache() -> Optional[ResponseCache]:
+    """Return the cache all requests go through (or None if there's none).
+    """
+    return _cache
+
+
+def set_recorder(recorder: Optional[Recorder]) -> None:
+    """Make all subsequent responses get recorded with 'recorder' (or not recorded if None).
+    """
+    global _recorder
+    _recorder = recorder
+
+
+def set_replayer(replayer: Optional[Replayer]) -> None:
+    """Make all subsequent requests get served by 'replayer' with no network (or go back to the
+    network if None).
+    """
+    global _replayer
+    _replayer = replayer
+
+
+def set_category_cache(cache: Optional[CategoryCache]) -> None:
+    """Make all subsequent category discoveries go through 'cache' (or rediscover categories every
+    time if None).
+    """
+    global _category_cache
+    _category_cache = cache
+
+
+def discover(key: str, func: Callable[[], List[T]]) -> List[T]:
+    """Return categories discovered by 'func' (identified by 'key', e.g. the discovery URL).
+
+    While fresh, they're served from the category cache, so the discovery request is skipped.
+    Responses being recorded or replayed always go through 'func' (so archives hold discovery
+    responses too).
+    """
+    if _category_cache is None or _recorder is not None or _replayer is not None:
+        return func()
+    values = _category_cache.get(key)
+    if values is not None:
+        log.debug(f"Serving {len(values)} cached categor(y/ies) for '{key}'.")
+        return values
+    values = func()
+    if values:
+        _category_cache.put(key, values)
+    return values
+
+
+def invalidate_discovery(key: str) -> None:
+    """Drop categories cached for 'key' (e.g. when fetching their events starts failing), so
+    they're discovered anew next time.
+    """
+    if _category_cache is not None:
+        log.debug(f"Invalidating cached categories for '{key}'.")
+        _category_cache.invalidate(key)
+
+
+def set_parse_memo(memo: Optional[ParseMemo]) -> None:
+    """Make subsequent parsing of markup pages (see pipeline()) reuse results memoised in 'memo'
+    (or parse everything anew if None, the default).
+    """
+    global _parse_memo
+    _parse_memo = memo
+
+
+def memoize(provider: str, key: Hashable, parse: Callable[..., R], *args: Any) -> R:
+    """Return parse(*args), reusing the result of an earlier call of the same 'key' (if a parse
+    memo is set).
+
+    Meant for parts of markup pages (e.g. tables) parsed in parsing workers (see pipeline()),
+    where it pays as long as 'key' (e.g. a fingerprint of a part's markup) is much cheaper to get
+    than parsing. Each worker memoises on its own. Memo hits are counted in metrics.METRICS under
+    'provider'. Results are shared between calls, so they should be treated as immutable.
+    """
+    if _parse_memo is None:
+        return parse(*args)
+    memo_key = (provider, parse.__module__, parse.__qualname__, key)
+    result = _parse_memo.get(memo_key, _MISSING)
+    if result is _MISSING:
+        result = parse(*args)
+        _parse_memo.put(memo_key, result)
     else:
-        print(f"Retrieving data from: '{url}'...")
-    with Timer() as t:
-        if postdata:
-            data = requests.post(url, json=postdata)
+        METRICS.count("cached", provider, "parse")
+    return result
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when the current deadline passes before a request (or parsing) is done.
+    """
+
+
+@contextmanager
+def deadline(seconds: Optional[float]) -> Generator[None, None, None]:
+    """Make all requests and pipelined parsing within the enclosed block (also in worker threads
+    of this module's helpers) give up 'seconds' from now with DeadlineExceeded.
+
+    An enclosing deadline that passes earlier is kept. None means no (additional) deadline.
+    """
+    if seconds is None:
+        yield
+        return
+    at, current = monotonic() + seconds, _deadline.get()
+    token = _deadline.set(at if current is None else min(at, current))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Return seconds left until the current deadline (or None if there's none).
+
+    Raise DeadlineExceeded if it's already passed.
+    """
+    at = _deadline.get()
+    if at is None:
+        return None
+    left = at - monotonic()
+    if left <= 0:
+        raise DeadlineExceeded("Deadline exceeded.")
+    return left
+
+
+def _within_deadline(timeout: Tuple[float, float]) -> Tuple[float, float]:
+    left = remaining()
+    if left is None:
+        return timeout
+    connect, read = timeout
+    return min(connect, left), min(read, left)
+
+
+def _pause(seconds: float) -> None:
+    # sleep unless it would outlast the current deadline
+    left = remaining()
+    if left is not None and seconds >= left:
+        raise DeadlineExceeded(f"Deadline exceeded ({left:.2f} second(s) left to pause for "
+                               f"{seconds:.2f}).")
+    sleep(seconds)
+
+
+def _submit(executor: Executor, fn: Callable[..., R], *args: Any) -> "Future[R]":
+    # run in a copy of the current context, so the deadline carries over to the worker thread
+    return executor.submit(copy_context().run, fn, *args)
+
+
+def _map(executor: Executor, fn: Callable[[T], R],
+         items: Iterable[T]) -> Generator[R, None, None]:
+    # like Executor.map(), but carrying the deadline over to worker threads
+    futures = [_submit(executor, fn, item) for item in items]
+    try:
+        for future in futures:
+            yield future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+class RateLimiter:
+    """Adaptive token bucket limiting rate of requests (e.g. to one host).
+
+    Requests are let through at 'rate' per second on average (with bursts of up to 'burst'
+    requests). The rate adapts: it grows a bit with every successful request (up to 'max_rate')
+    and halves whenever the server signals it's overwhelmed (down to 'min_rate'), so it settles
+    at about the fastest rate the server tolerates.
+
+    Thread-safe, so concurrent workers share the limit instead of each sleeping on its own.
+    """
+    def __init__(self, rate: float, burst: int = 1, min_rate: Optional[float] = None,
+                 max_rate: Optional[float] = None) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate or rate / MAX_SLOWDOWN
+        self.max_rate = max_rate or rate * MAX_SPEEDUP
+        self._step = rate * SPEEDUP_STEP
+        self._tokens = float(burst)
+        self._updated = monotonic()
+        self._lock = Lock()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(rate={self.rate:.2f}, burst={self.burst})"
+
+    def _refill(self) -> None:
+        now = monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> None:
+        """Block until the next request is allowed (no waiting while replaying).
+
+        Raise DeadlineExceeded (with no token taken) if that would outlast the current deadline.
+        """
+        if _replayer is not None:
+            return
+        with self._lock:
+            self._refill()
+            delay = (1 - self._tokens) / self.rate if self._tokens < 1 else 0.0
+            left = remaining()
+            if left is not None and delay >= left:
+                raise DeadlineExceeded(f"Deadline exceeded ({left:.2f} second(s) left to wait "
+                                       f"{delay:.2f} for a request to '{self}').")
+            self._tokens -= 1  # below zero it's a reservation of a future token
+        if delay > 0:
+            log.debug(f"Throttling for {int(delay * 1000)} ms..")
+            sleep(delay)
+
+    def speed_up(self) -> None:
+        with self._lock:
+            self._refill()
+            self.rate = min(self.max_rate, self.rate + self._step)
+
+    def slow_down(self, pause: float = 0.0) -> None:
+        """Halve the rate and, if 'pause' is specified, hold off all requests for that long.
+        """
+        with self._lock:
+            self._refill()
+            self.rate = max(self.min_rate, self.rate / 2)
+            if pause:
+                self._tokens = min(self._tokens, -pause * self.rate)
+        log.debug(f"Slowed down to {self.rate:.2f} request(s) per second.")
+
+
+def configure_limiter(url: str, rate: float, burst: int = 1, min_rate: Optional[float] = None,
+                      max_rate: Optional[float] = None) -> RateLimiter:
+    """Set up the rate limiter for all requests to the host of 'url' (e.g. as a provider tolerates
+    them). An already set up limiter is kept as it is (with its adapted rate).
+    """
+    host = urlsplit(url).netloc
+    with _limiters_lock:
+        limiter = _limiters.get(host)
+        if limiter is None:
+            limiter = _limiters[host] = RateLimiter(rate, burst, min_rate, max_rate)
+    return limiter
+
+
+def get_limiter(url: str) -> RateLimiter:
+    """Return the rate limiter shared by all requests to the host of 'url' (set up with
+    DEFAULT_RATE if it's not been configured).
+    """
+    return configure_limiter(url, DEFAULT_RATE)
+
+
+def _retry_after(response: requests.Response) -> float:
+    # 'Retry-After' is either seconds or an HTTP date
+    value = response.headers.get("Retry-After")
+    if not value:
+        return 0.0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time())
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _label(url: str, provider: str) -> str:
+    # metrics label for requests made without naming their provider
+    return provider or urlsplit(url).netloc
+
+
+def _request(url: str, postdata: Optional[Json], timeout: Tuple[float, float],
+             headers: Optional[Dict[str, str]] = None, stream=False) -> requests.Response:
+    session = get_session(url)
+    if postdata:
+        return session.post(url, json=postdata, timeout=timeout, headers=headers, stream=stream)
+    return session.get(url, timeout=timeout, headers=headers, stream=stream)
+
+
+def _send(url: str, label: str, postdata: Optional[Json], timeout: Tuple[float, float],
+          headers: Optional[Dict[str, str]] = None, stream=False) -> requests.Response:
+    # rate-limited request, retried with exponential backoff (and jitter) on connection
+    # errors, timeouts and responses signalling the server is overwhelmed or failing
+    limiter = get_limiter(url)
+    for attempt in range(MAX_RETRIES + 1):
+        limiter.acquire()
+        attempt_timeout = _within_deadline(timeout)
+        METRICS.count("requests", label, "fetch")
+        backoff = random.uniform(0, min(MAX_BACKOFF, BACKOFF_BASE * 2 ** attempt))
+        try:
+            response = _request(url, postdata, attempt_timeout, headers, stream)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            METRICS.count("errors", label, "fetch")
+            if attempt == MAX_RETRIES:
+                raise
+            log.warning(f"Request to '{url}' failed with: {e!r}. Retrying in {backoff:.2f} "
+                        f"second(s)...")
+            _pause(backoff)
+            continue
+        if response.status_code not in RETRY_STATUSES:
+            limiter.speed_up()
+            return response
+        METRICS.count("errors", label, "fetch")
+        if attempt == MAX_RETRIES:
+            return response
+        pause = min(MAX_BACKOFF, max(backoff, _retry_after(response)))
+        if response.status_code in (429, 503):
+            limiter.slow_down(pause)
+        log.warning(f"Request to '{url}' got HTTP {response.status_code}. Retrying in "
+                    f"{pause:.2f} second(s)...")
+        response.close()
+        _pause(pause)
+    raise AssertionError("unreachable")
+
+
+def _transferred(response: requests.Response) -> int:
+    # bytes read off the wire so far (i.e. still compressed, if the response was)
+    raw = getattr(response, "raw", None)
+    return raw.tell() if raw is not None else len(response.content)
+
+
+def _fetch(url: str, label: str, postdata: Optional[Json], timeout: Tuple[float, float],
+           headers: Optional[Dict[str, str]] = None, raise_for_status=False) -> requests.Response:
+    data = _send(url, label, postdata, timeout, headers)
+    data.content  # read the body, so all of it is accounted for
+    METRICS.count("bytes", label, "fetch", _transferred(data))
+    if raise_for_status:
+        data.raise_for_status()
+    return data
+
+
+def _cached_request(url: str, label: str, postdata: Optional[Json],
+                    timeout: Tuple[float, float], raise_for_status=False) -> str:
+    entry = _cache.get(url, postdata)
+    if entry and _cache.is_fresh(entry):
+        log.debug(f"Serving cached response ({entry.age:.1f} second(s) old).")
+        return entry.text
+    data = _fetch(url, label, postdata, timeout, entry.validators if entry else None,
+                  raise_for_status)
+    if entry and data.status_code == 304:
+        log.debug("Cached response revalidated.")
+        return _cache.refresh(entry, postdata, data.headers).text
+    if data.ok:
+        _cache.put(url, data.text, postdata, data.headers)
+    return data.text
+
+
+def timed_request(url: str, provider="", postdata: Optional[Json] = None,
+                  return_json=False, raise_for_status=False,
+                  timeout: Tuple[float, float] = (CONNECT_TIMEOUT, READ_TIMEOUT)
+                  ) -> Union[List[Json], Json, str]:
+    """Retrieve data from 'url' (POSTing 'postdata' if specified).
+
+    With 'raise_for_status', an error response (4xx or 5xx) raises requests.HTTPError instead of
+    having its body returned.
+
+    Latency, count and size of requests (and latency of JSON decoding) are recorded in
+    metrics.METRICS under 'provider' (or, if not specified, under the URL's host).
+    """
+    label = _label(url, provider)
+    log.debug(f"Retrieving data from: '{url}'...")
+    with METRICS.timed(label, "fetch"):
+        if _replayer is not None:
+            text = _replayer.serve(url, postdata)
+        elif _cache is not None:
+            text = _cached_request(url, label, postdata, timeout, raise_for_status)
         else:
-            data = requests.get(url)
-    print(f"Request completed in {t.elapsed:.3f} seconds.")
+            text = _fetch(url, label, postdata, timeout, raise_for_status=raise_for_status).text
+    if _recorder is not None and _replayer is None:
+        _recorder.record(url, text, postdata)
     if return_json:
-        return data.json()
-    return data.text
+        with METRICS.timed(label, "decode"):
+            return json.loads(text)
+    return text
+
+
+def _walk(data: Any, prefix: List[str]) -> Generator[Any, None, None]:
+    # yield what 'prefix' (in ijson notation) points to in already decoded 'data'
+    if not prefix:
+        yield data
+        return
+    head, *tail = prefix
+    if head == "item":
+        if isinstance(data, list):
+            for element in data:
+                yield from _walk(element, tail)
+    elif isinstance(data, dict) and head in data:
+        yield from _walk(data[head], tail)
+
+
+def stream_json(url: str, prefix: str, provider="", postdata: Optional[Json] = None,
+                predicate: Optional[Callable[[Any], bool]] = None,
+                timeout: Tuple[float, float] = (CONNECT_TIMEOUT, READ_TIMEOUT)
+                ) -> Generator[Any, None, None]:
+    """Yield objects found at 'prefix' of JSON retrieved from 'url' (optionally, only those
+    satisfying 'predicate').
+
+    'prefix' is in ijson notation, e.g. "item" means elements of a top-level array and
+    "Response.item.Categories" - "Categories" of every element of top-level "Response" array.
+
+    With ijson installed, the response is parsed incrementally as it comes, so only one object
+    at a time is held decoded. Otherwise (or when the response has to be cached, recorded or
+    replayed as a whole) it falls back to timed_request().
+    """
+    predicate = predicate or (lambda _: True)
+    if ijson is None or any(hook is not None for hook in (_cache, _recorder, _replayer)):
+        data = timed_request(url, provider, postdata, return_json=True, timeout=timeout)
+        yield from (obj for obj in _walk(data, prefix.split(".")) if predicate(obj))
+        return
+
+    label = _label(url, provider)
+    log.debug(f"Streaming data from: '{url}'...")
+    # fetching and decoding are interleaved here, so it's all accounted for as fetching
+    with METRICS.timed(label, "fetch"):
+        with _send(url, label, postdata, timeout, stream=True) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True  # let urllib3 decompress gzip/brotli
+            try:
+                for obj in ijson.items(response.raw, prefix, use_float=True):
+                    remaining()  # a slowly trickling response mustn't outlast the deadline
+                    if predicate(obj):
+                        yield obj
+            finally:
+                METRICS.count("bytes", label, "fetch", _transferred(response))
+
+
+def iter_pages(fetch_page: Callable[[int, int], T], limit: int,
+               total: Optional[int] = None, size: Callable[[T], int] = len,
+               max_workers: int = MAX_PAGE_WORKERS) -> Generator[T, None, None]:
+    """Retrieve pages of an offset/limit paginated resource and yield them in order as they come.
+
+    'fetch_page' takes an offset and a limit and returns a page (of items). If 'total' (count of
+    all items) is known, all remaining pages are fetched concurrently at once. Otherwise, they
+    are fetched concurrently in windows of 'max_workers' pages until a page shorter than 'limit'
+    (as measured by 'size') signals the end. Requests are spaced out by their hosts' rate limiters.
+    """
+    def fetch(offset: int) -> T:
+        return fetch_page(offset, limit)
+
+    page = fetch(0)
+    yield page
+    count = 1
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        if total is not None:
+            for page in _map(executor, fetch, range(limit, total, limit)):
+                yield page
+                count += 1
+        else:
+            offset = limit
+            while size(page) >= limit:
+                window = [offset + i * limit for i in range(max_workers)]
+                for page in _map(executor, fetch, window):
+                    yield page
+                    count += 1
+                    if size(page) < limit:
+                        break
+                offset = window[-1] + limit
+    log.debug(f"Retrieved {count} page(s).")
+
+
+def get_parse_pool() -> Optional[ProcessPoolExecutor]:
+    """Return the process pool shared by all CPU-bound parsing (or None if PARSE_PROCESSES is 0).
+
+    The pool is started on first use and kept for subsequent scrapes.
+    """
+    global _parse_pool
+    if PARSE_PROCESSES < 1:
+        return None
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            # forking a process with (scraping) threads running is unsafe
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() \
+                else "spawn"
+            _parse_pool = ProcessPoolExecutor(max_workers=PARSE_PROCESSES,
+                                              mp_context=multiprocessing.get_context(method))
+    return _parse_pool
+
+
+def close_parse_pool() -> None:
+    """Shut down the parsing process pool (a new one is started if needed again).
+    """
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is not None:
+            _parse_pool.shutdown()
+            _parse_pool = None
+
+
+def _memo_hits() -> float:
+    return sum(v for (name, *_), v in list(METRICS.counters.items()) if name == "cached")
+
+
+def _timed_parse(parse: Callable[[str], List[R]], payload: str,
+                 memoise: Optional[bool] = None) -> Tuple[List[R], float, float]:
+    # run in a worker process whose metrics are lost, so its timing (and memo hits) are returned
+    # instead; the worker keeps a memo of its own (for memoize()) while the parent has one
+    # ('memoise' is None when run in the parent itself)
+    global _parse_memo
+    if memoise is not None and memoise != (_parse_memo is not None):
+        _parse_memo = ParseMemo() if memoise else None
+    hits = _memo_hits()
+    start = perf_counter()
+    result = parse(payload)
+    return result, perf_counter() - start, _memo_hits() - hits
+
 
+def pipeline(fetch: Callable[[T], str], parse: Callable[[str], List[R]], items: Iterable[T],
+             provider: str, max_workers: int = MAX_PAGE_WORKERS
+             ) -> Generator[List[R], None, None]:
+    """Fetch payloads for 'items' concurrently and parse them in the parsing process pool while
+    further fetches are still in flight. Yield each payload's parsed results as soon as they come
+    (in order of completion).
 
+    'parse' has to be picklable (a module-level function) and return picklable results. Parsing
+    latency is recorded in metrics.METRICS under 'provider'. If a parse memo is set (see
+    set_parse_memo()), payloads identical to already parsed ones (as told by their raw text's
+    fingerprints) aren't parsed again and 'parse' may memoise parts of payloads (see memoize()).
+    """
+    pool = get_parse_pool()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        fetching = {_submit(executor, fetch, item) for item in items}
+        parsing: Dict[Future, Optional[Tuple]] = {}  # futures to their memo keys
+        try:
+            while fetching or parsing:
+                done, _ = wait(fetching | set(parsing), timeout=remaining(),
+                               return_when=FIRST_COMPLETED)
+                if not done:
+                    raise DeadlineExceeded("Deadline exceeded while fetching or parsing.")
+                for future in done:
+                    if future in fetching:
+                        fetching.remove(future)
+                        payload = future.result()
+                        key = None
+                        if _parse_memo is not None:
+                            key = (provider, parse.__module__, parse.__qualname__,
+                                   _parse_memo.fingerprint(payload))
+                            result = _parse_memo.get(key, _MISSING)
+                            if result is not _MISSING:
+                                METRICS.count("cached", provider, "parse")
+                                yield result
+                                continue
+                        if pool is not None:
+                            parsing[pool.submit(_timed_parse, parse, payload,
+                                                _parse_memo is not None)] = key
+                        else:
+                            parsing[_submit(executor, _timed_parse, parse, payload)] = key
+                        continue
+                    key = parsing.pop(future)
+                    try:
+                        result, seconds, hits = future.result()
+                    except Exception:
+                        METRICS.count("errors", provider, "parse")
+                        raise
+                    METRICS.observe(provider, "parse", seconds)
+                    if pool is not None and hits:  # (otherwise they're counted already)
+                        METRICS.count("cached", provider, "parse", hits)
+                    if key is not None:
+                        _parse_memo.put(key, result)
+                    yield result
+        finally:
+            for future in fetching | set(parsing):
+                future.cancel()